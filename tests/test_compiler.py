@@ -0,0 +1,54 @@
+"""
+    Regression checks for the Torque Script compiler. String literals must reach the interpreter with their escape
+    sequences collapsed, as they do when the engine compiles them.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "torquescript", "compiler"))
+
+import compiler
+import interpreter
+from interpreter.v1.opcodes import PushString, Add, SetGlobal
+
+SAMPLE_SOURCE = r"""$a = "say \"hi\"";
+$b = "x\ty\n";
+$c = 'tag\x41\c0\\z';
+$d["k\t"] = "v";
+$e = "odd\q";
+"""
+
+class CompilerTest(unittest.TestCase):
+    def test_collapse_escapes(self):
+        self.assertEqual(compiler.collapse_escapes(r"plain"), "plain")
+        self.assertEqual(compiler.collapse_escapes(r"\cr\cp\co\c9\x7e"), "\x0f\x10\x11\x0e~")
+        self.assertEqual(compiler.collapse_escapes(r"\\n"), "\\n")
+
+    def test_string_literals(self):
+        vm = interpreter.Interpreter()
+        vm.register_codeblock(compiler.Compiler().compile(compiler.parser.AST(SAMPLE_SOURCE).root_data))
+
+        global_variables = dict((name, str(value)) for name, value in vm.global_variables.items())
+        self.assertEqual(global_variables, {
+            "a": "say \"hi\"",
+            "b": "x\ty\n",
+            "c": "tagA\x01\\z",
+            "dk\t": "v",
+            "e": "odd\\q",
+        })
+
+    def test_folded_floats(self):
+        # 0.1 + 0.2 reads as "0.3" but is not 0.3, so it has to be left for the runtime
+        for lhs, rhs, folded in [("0.1", "0.2", False), ("1.5", "2", True)]:
+            code_block = interpreter.v2.CodeBlock()
+            code_block.string_table = ["x", lhs, rhs]
+            code_block.global_code = [PushString([0]), PushString([1]), PushString([2]), Add(), SetGlobal()]
+            self.assertEqual(compiler.optimizer.optimize(code_block) != 0, folded)
+
+            vm = interpreter.Interpreter()
+            vm.register_codeblock(code_block)
+            self.assertEqual(str(vm.global_variables["x"]), str(float(lhs) + float(rhs)))
+
+if __name__ == "__main__":
+    unittest.main()
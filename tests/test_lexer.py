@@ -0,0 +1,73 @@
+"""
+    Regression checks for the Torque Script lexer. The token stream must match that of the original lexer, which tried
+    every token type in turn on the rest of the input and carried on down the list after each match.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "torquescript", "compiler"))
+
+import lexer
+
+SAMPLE_SOURCE = """// Leading comment
+/* Block
+   comment */
+$pref::Server::Name = "My Server";
+$arr[1, "two"] = 5.5;
+$neg = -12;
+$a = 5-3;
+$b = %a-1;
+$c = 5 -3;
+$d = 5 - 3;
+$e = foo(1,-2);
+$f = $g-1;
+$h = foo()-1;
+$i = x[1]-2;
+$j = a--1 ;
+$k = "a" TAB "b" SPC 'c';
+$l $= $m;
+new ScriptObject(MyObj) {
+	classname = "Foo";
+	value[0] = -1;
+	new SimObject(Child) { x = 3 ; };
+};
+$z = a ? b : c.d;
+"""
+
+def generate_reference_token_stream(buffer):
+    """
+        Produces tokens the way the original lexer did, for comparison.
+    """
+    while len(buffer) != 0:
+        produced_match = False
+        for token_type in lexer.Token.__subclasses__():
+            match_data = token_type.PATTERN.match(buffer)
+            if match_data is not None:
+                produced_match = True
+                yield token_type(match_data, 0)
+                buffer = buffer[match_data.end():]
+
+        if produced_match is False and len(buffer) != 0:
+            raise lexer.LexicalError("Failed to match next token.")
+
+class LexerTest(unittest.TestCase):
+    def get_tokens(self, tokens):
+        return [(token.__class__.__name__, token.data) for token in tokens]
+
+    def test_matches_reference(self):
+        self.assertEqual(self.get_tokens(lexer.generate_token_stream(SAMPLE_SOURCE)), self.get_tokens(generate_reference_token_stream(SAMPLE_SOURCE)))
+
+    def test_subtraction(self):
+        tokens = self.get_tokens(lexer.generate_token_stream("5-3;%a-1;", ignore_whitespace=True))
+        self.assertEqual(tokens, [("Number", "5"), ("Operator", "-"), ("Number", "3"), ("Terminator", ";"), ("LocalReference", "a"), ("Operator", "-"), ("Number", "1"), ("Terminator", ";")])
+
+    def test_resume(self):
+        # Resuming after a token lexes the rest exactly as a full pass does
+        tokens = list(lexer.generate_token_stream(SAMPLE_SOURCE))
+        for token_index in range(len(tokens) - 1):
+            resumed = lexer.generate_token_stream(SAMPLE_SOURCE, position=tokens[token_index].end_offset, previous_type=type(tokens[token_index]))
+            self.assertEqual(self.get_tokens(resumed), self.get_tokens(tokens[token_index + 1:]))
+
+if __name__ == "__main__":
+    unittest.main()
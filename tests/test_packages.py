@@ -0,0 +1,70 @@
+"""
+    Regression checks for packages. Functions registered into a package that is already active take effect right away,
+    beneath any package activated after it.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "torquescript"))
+
+import interpreter
+from interpreter.v1.opcodes import PushString, Return
+
+def build_block(functions):
+    """
+        Builds a code block of functions that each return a string.
+
+        :param functions: A dictionary mapping function names to the string they return.
+        :rtype: interpreter.v2.CodeBlock
+        :return: The code block.
+    """
+    block = interpreter.v2.CodeBlock()
+    block.string_table = []
+    for function_name, result in functions.items():
+        block.function_table[function_name] = [PushString([len(block.string_table)]), Return()]
+        block.string_table.append(result)
+    return block
+
+class PackageTest(unittest.TestCase):
+    def setUp(self):
+        self.vm = interpreter.Interpreter()
+        self.vm.register_codeblock(build_block({"greet": "base"}))
+        self.vm.register_codeblock(build_block({"greet": "A"}), package_name="PkgA")
+        self.vm.register_codeblock(build_block({"greet": "B"}), package_name="PkgB")
+        self.vm.activate_package("PkgA")
+        self.vm.activate_package("PkgB")
+
+    def call(self, function_name):
+        return str(self.vm.call(function_name))
+
+    def test_new_function_in_active_package(self):
+        self.vm.register_codeblock(build_block({"newfn": "A"}), package_name="PkgA")
+        self.assertEqual(self.call("newfn"), "A")
+
+        self.vm.builtin_functions["deactivatepackage"].call(self.vm, ["PkgA"])
+        self.assertNotIn("newfn", self.vm.global_functions)
+        self.assertEqual(self.call("greet"), "B")
+
+    def test_activation_order(self):
+        # PkgB was activated last, so it stays on top even though PkgA declared the function after it
+        self.vm.register_codeblock(build_block({"newfn": "B"}), package_name="PkgB")
+        self.vm.register_codeblock(build_block({"newfn": "A"}), package_name="PkgA")
+        self.assertEqual(self.call("newfn"), "B")
+
+        self.vm.deactivate_package("PkgB")
+        self.assertEqual(self.call("newfn"), "A")
+        self.vm.deactivate_package("PkgA")
+        self.assertNotIn("newfn", self.vm.global_functions)
+
+    def test_inactive_package(self):
+        self.vm.deactivate_package("PkgA")
+        self.vm.register_codeblock(build_block({"newfn": "A"}), package_name="PkgA")
+        self.assertNotIn("newfn", self.vm.global_functions)
+
+        self.vm.activate_package("PkgA")
+        self.assertEqual(self.call("newfn"), "A")
+        self.assertEqual(self.call("greet"), "A")
+
+if __name__ == "__main__":
+    unittest.main()
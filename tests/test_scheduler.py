@@ -0,0 +1,58 @@
+"""
+    Regression checks for the scheduler. Events must run in time order, and a delay that is not a finite number must not
+    hold up the events behind it.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "torquescript"))
+
+import interpreter
+from interpreter.classes import ScriptObject
+from interpreter.v1.opcodes import GetArgument, SetGlobal, PushString, Return
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        # tick(%a) and Foo::tick(%this, %a) both store %a in $ran
+        block = interpreter.v2.CodeBlock()
+        block.string_table = ["ran", ""]
+        block.function_table["tick"] = [PushString([0]), GetArgument([0]), SetGlobal(), PushString([1]), Return()]
+        block.function_table["foo::tick"] = [PushString([0]), GetArgument([1]), SetGlobal(), PushString([1]), Return()]
+
+        self.vm = interpreter.Interpreter()
+        self.vm.register_codeblock(block)
+        self.schedule = self.vm.builtin_functions["schedule"]
+
+    def get_ran(self):
+        return str(self.vm.global_variables.get("ran", ""))
+
+    def test_order(self):
+        self.schedule.call(self.vm, ["20", "0", "tick", "second"])
+        self.schedule.call(self.vm, ["10", "0", "tick", "first"])
+        self.assertEqual(self.vm.process_until(15), 1)
+        self.assertEqual(self.get_ran(), "first")
+        self.assertEqual(self.vm.process_until(25), 1)
+        self.assertEqual(self.get_ran(), "second")
+
+    def test_non_finite_delays(self):
+        sim_object = ScriptObject(self.vm)
+        sim_object.set_member("classname", "Foo")
+
+        for delay in ["nan", "inf", "-inf", "1e400"]:
+            self.schedule.call(self.vm, [delay, "0", "tick", delay])
+            sim_object.call("schedule", delay, "tick", delay)
+        self.schedule.call(self.vm, ["10", "0", "tick", "last"])
+
+        self.assertEqual(self.vm.process_until(100), 9)
+        self.assertEqual(self.get_ran(), "last")
+        self.assertEqual(self.vm.event_heap, [])
+
+    def test_non_finite_identifiers(self):
+        for function_name in ["isEventPending", "cancel", "getEventTimeLeft"]:
+            for event_identifier in ["nan", "inf", "1e400"]:
+                result = self.vm.builtin_functions[function_name.lower()].call(self.vm, [event_identifier])
+                self.assertIn(str(result), ("", "0"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+    Regression checks for sim sets. Reads by index must see the members in order whether or not removals have left
+    holes, which is when the binary indexed tree is used, and deleting a set must let go of its members.
+"""
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "torquescript"))
+
+import interpreter
+from interpreter.classes import ScriptObject, SimSet, SimGroup
+
+class SimSetTest(unittest.TestCase):
+    def setUp(self):
+        self.vm = interpreter.Interpreter()
+
+    def check_members(self, sim_set, expected):
+        self.assertEqual(sim_set.get_count(), len(expected))
+        self.assertEqual([sim_set.get_object_at(member_index) for member_index in range(len(expected))], expected)
+        self.assertEqual(list(sim_set.get_objects()), expected)
+        self.assertIsNone(sim_set.get_object_at(len(expected)))
+
+    def test_index_with_holes(self):
+        sim_set = SimSet(self.vm)
+        expected = [ScriptObject(self.vm) for object_index in range(200)]
+        for sim_object in expected:
+            sim_set.add_member(sim_object)
+
+        # Few enough removals to leave holes, so the reads go through the tree rather than closing them up
+        random.seed(22)
+        for sim_object in random.sample(expected, 20):
+            sim_set.remove_member(sim_object)
+            expected.remove(sim_object)
+            self.assertEqual(sim_set.get_object_at(len(expected) // 2), expected[len(expected) // 2])
+        self.assertNotEqual(sim_set.hole_count, 0)
+        self.assertIsNotNone(sim_set.member_counts)
+
+        # Members added while the tree is built extend it
+        for object_index in range(10):
+            sim_object = ScriptObject(self.vm)
+            sim_set.add_member(sim_object)
+            expected.append(sim_object)
+        self.assertNotEqual(sim_set.hole_count, 0)
+        self.check_members(sim_set, expected)
+
+        # Removing most members closes up the holes
+        for sim_object in expected[:150]:
+            sim_set.remove_member(sim_object)
+        self.check_members(sim_set, expected[150:])
+
+    def test_get_object(self):
+        sim_set = SimSet(self.vm)
+        sim_object = ScriptObject(self.vm)
+        sim_set.add_member(sim_object)
+
+        for member_index in ["1", "-1"]:
+            self.assertEqual(str(sim_set.call("getObject", member_index)), "-1")
+
+        # Like any other integer argument, an index that isn't a finite number reads as zero
+        for member_index in ["0", "nan", "inf", "1e400"]:
+            self.assertEqual(int(sim_set.call("getObject", member_index)), sim_object.identifier)
+
+    def test_delete(self):
+        sim_set = SimSet(self.vm)
+        other_set = SimSet(self.vm)
+        members = [ScriptObject(self.vm) for object_index in range(3)]
+        for sim_object in members:
+            sim_set.add_member(sim_object)
+            other_set.add_member(sim_object)
+
+        sim_set.call("delete")
+        self.assertFalse(self.vm.is_registered(sim_set))
+        for sim_object in members:
+            self.assertTrue(self.vm.is_registered(sim_object))
+            self.assertEqual(sim_object.sets, [other_set])
+        self.check_members(other_set, members)
+
+    def test_delete_group(self):
+        sim_group = SimGroup(self.vm)
+        sim_set = SimSet(self.vm)
+        members = [ScriptObject(self.vm) for object_index in range(3)]
+        for sim_object in members:
+            sim_group.add_member(sim_object)
+            sim_set.add_member(sim_object)
+
+        sim_group.call("delete")
+        for sim_object in members:
+            self.assertFalse(self.vm.is_registered(sim_object))
+        self.check_members(sim_set, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+    Batch front end for the Torque Script parser. This parses whole directory trees of script files, spreading the work
+    across a pool of processes.
+"""
+import os
+import sys
+import collections
+import multiprocessing
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+import parser
+
+class ParseResult(object):
+    """
+        The outcome of parsing a single script file.
+    """
+
+    path = None
+    """
+        The path of the script file.
+    """
+
+    root_data = None
+    """
+        The root data of the file as produced by parser.serialize_tree, or None if the file failed to parse. Use load to
+        get the AST elements back.
+    """
+
+    error = None
+    """
+        The error message if the file failed to parse.
+    """
+
+    error_type = None
+    """
+        The name of the exception class raised if the file failed to parse.
+    """
+
+    line_number = None
+    """
+        The line number reported by the error, if any.
+    """
+
+    def __init__(self, path, root_data=None, error=None, error_type=None, line_number=None):
+        self.path = path
+        self.root_data = root_data
+        self.error = error
+        self.error_type = error_type
+        self.line_number = line_number
+
+    def load(self):
+        """
+            Rebuilds the AST elements for this file.
+
+            :rtype: list
+            :return: The root data of the file.
+        """
+        return parser.deserialize_tree(self.root_data)
+
+def parse_file(path):
+    """
+        Parses a single script file. This runs inside of the worker processes, so everything it returns is reduced to plain
+        tuples and strings to keep the trip back to the parent process cheap.
+
+        :param path: The path of the script file to parse.
+        :rtype: tuple
+        :return: A tuple of the path, the serialized root data, the error message, the error type and the line number.
+    """
+    try:
+        with open(path, "rb") as handle:
+            root_data = parser.AST(handle).root_data
+        return (path, parser.serialize_tree(root_data), None, None, None)
+    except StopIteration:
+        # The parser pulls tokens with next(), so input that ends mid statement surfaces as StopIteration
+        return (path, None, "Unexpected end of file.", parser.SyntaxError.__name__, None)
+    except Exception as e:
+        # Exceptions with custom constructors don't survive pickling, so only their details are sent back
+        return (path, None, str(e), e.__class__.__name__, getattr(e, "line_number", None))
+
+def find_script_files(directory, extensions=(".cs",)):
+    """
+        Finds all script files below a directory.
+
+        :param directory: The directory to search.
+        :param extensions: The file extensions to accept, compared case insensitively.
+        :rtype: list
+        :return: A sorted list of the paths of all script files found.
+    """
+    result = []
+    for path, directory_names, file_names in os.walk(directory):
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1].lower() in extensions:
+                result.append(os.path.join(path, file_name))
+    return sorted(result)
+
+def parse_files(paths, max_workers=None, chunk_size=16):
+    """
+        Parses a list of script files across a pool of processes.
+
+        :param paths: The paths of the script files to parse.
+        :param max_workers: The number of worker processes to use. Defaults to the number of processors. A value of 1
+        parses everything in the current process.
+        :param chunk_size: The number of files handed to a worker at a time.
+        :rtype: collections.OrderedDict
+        :return: A dictionary mapping each path to its ParseResult, in the order the paths were given.
+    """
+    if max_workers is None:
+        max_workers = multiprocessing.cpu_count()
+
+    if max_workers == 1:
+        result_data = [parse_file(path) for path in paths]
+    elif ProcessPoolExecutor is not None:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            result_data = list(executor.map(parse_file, paths, chunksize=chunk_size))
+    else:
+        pool = multiprocessing.Pool(processes=max_workers)
+        try:
+            result_data = pool.map(parse_file, paths, chunk_size)
+        finally:
+            pool.close()
+            pool.join()
+
+    return collections.OrderedDict([(current_result[0], ParseResult(*current_result)) for current_result in result_data])
+
+def parse_directory(directory, max_workers=None, extensions=(".cs",)):
+    """
+        Parses every script file below a directory across a pool of processes.
+
+        :param directory: The directory to search for script files.
+        :param max_workers: The number of worker processes to use. Defaults to the number of processors.
+        :param extensions: The file extensions to accept.
+        :rtype: collections.OrderedDict
+        :return: A dictionary mapping each path to its ParseResult.
+    """
+    return parse_files(find_script_files(directory, extensions), max_workers=max_workers)
+
+if __name__ == "__main__":
+    results = parse_directory(sys.argv[1])
+
+    failures = [current_result for current_result in results.values() if current_result.error is not None]
+    for current_result in failures:
+        sys.stderr.write("%s: %s: %s\n" % (current_result.path, current_result.error_type, current_result.error))
+    print("Parsed %u files, %u failed." % (len(results), len(failures)))
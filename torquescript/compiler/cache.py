@@ -0,0 +1,163 @@
+"""
+    On disk cache of parse results for the Torque Script parser. Results are stored in their serialized form under a hash
+    of the script source and the parser version, so loading them back never runs the lexer.
+"""
+import os
+import sys
+import marshal
+import hashlib
+import collections
+
+from lexer import map_file
+import parser
+
+class ParseCache(object):
+    """
+        A size bounded cache of parse results in a directory. When the cache grows past its maximum size, the least
+        recently used entries are removed. File modification times record when each entry was last used.
+    """
+
+    ENTRY_EXTENSION = ".ast"
+    """
+        The file extension used for cache entries.
+    """
+
+    directory = None
+    """
+        The directory holding the cache entries.
+    """
+
+    maximum_size = None
+    """
+        The maximum total size of all cache entries in bytes.
+    """
+
+    current_size = None
+    """
+        The current total size of all cache entries in bytes.
+    """
+
+    entries = None
+    """
+        An ordered dictionary mapping entry keys to their size in bytes, least recently used first.
+    """
+
+    def __init__(self, directory, maximum_size=64 * 1024 * 1024):
+        self.directory = directory
+        self.maximum_size = maximum_size
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Rebuild the usage order from the previous run
+        entry_data = []
+        for file_name in os.listdir(directory):
+            key, extension = os.path.splitext(file_name)
+            if extension == self.ENTRY_EXTENSION:
+                file_stat = os.stat(os.path.join(directory, file_name))
+                entry_data.append((file_stat.st_mtime, key, file_stat.st_size))
+
+        self.entries = collections.OrderedDict([(key, size) for modification_time, key, size in sorted(entry_data)])
+        self.current_size = sum(self.entries.values())
+
+    def get_key(self, source):
+        """
+            Generates the cache key for a script source.
+
+            :param source: The script source as a string or mmap.
+            :rtype: str
+            :return: The hex digest naming the cache entry for the source.
+        """
+        # Marshal data is only readable by the Python version that wrote it
+        hasher = hashlib.sha1("%u:%u.%u:" % (parser.PARSER_VERSION, sys.version_info[0], sys.version_info[1]))
+        hasher.update(source)
+        return hasher.hexdigest()
+
+    def get_entry_path(self, key):
+        return os.path.join(self.directory, key + self.ENTRY_EXTENSION)
+
+    def load(self, source):
+        """
+            Loads the parse result for a script source from the cache.
+
+            :param source: The script source as a string or mmap.
+            :rtype: list
+            :return: The root data for the source, or None if it is not cached.
+        """
+        key = self.get_key(source)
+        if key not in self.entries:
+            return None
+
+        entry_path = self.get_entry_path(key)
+        try:
+            with open(entry_path, "rb") as handle:
+                root_data = marshal.load(handle)
+        except (EnvironmentError, EOFError, ValueError, TypeError):
+            # Removed or damaged behind our back, forget about it
+            self.remove(key)
+            return None
+
+        os.utime(entry_path, None)
+        self.entries[key] = self.entries.pop(key)
+        return parser.deserialize_tree(root_data)
+
+    def store(self, source, root_data):
+        """
+            Stores the parse result for a script source, evicting the least recently used entries if necessary.
+
+            :param source: The script source as a string or mmap.
+            :param root_data: The root data produced by parsing the source.
+        """
+        key = self.get_key(source)
+        entry_path = self.get_entry_path(key)
+        entry_data = marshal.dumps(parser.serialize_tree(root_data))
+
+        # Write to a temporary file first so that a concurrent reader never sees a partial entry
+        temporary_path = "%s.%u" % (entry_path, os.getpid())
+        with open(temporary_path, "wb") as handle:
+            handle.write(entry_data)
+        os.rename(temporary_path, entry_path)
+
+        self.current_size -= self.entries.pop(key, 0)
+        self.entries[key] = len(entry_data)
+        self.current_size += len(entry_data)
+
+        while self.current_size > self.maximum_size:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        """
+            Removes an entry from the cache.
+
+            :param key: The key of the entry to remove.
+        """
+        self.current_size -= self.entries.pop(key, 0)
+        try:
+            os.remove(self.get_entry_path(key))
+        except EnvironmentError:
+            pass
+
+    def parse(self, source):
+        """
+            Parses a script source, using the cached result if there is one.
+
+            :param source: The script source as a string or mmap.
+            :rtype: list
+            :return: The root data for the source.
+        """
+        root_data = self.load(source)
+        if root_data is None:
+            root_data = parser.AST(source).root_data
+            self.store(source, root_data)
+        return root_data
+
+    def parse_file(self, path):
+        """
+            Parses a script file, using the cached result if there is one. The file is memory mapped rather than read in.
+
+            :param path: The path of the script file to parse.
+            :rtype: list
+            :return: The root data for the file.
+        """
+        with open(path, "rb") as handle:
+            return self.parse(map_file(handle))
@@ -1,4 +1,286 @@
-"""
+"""
 	Implementation of the Torque Script compiler. This accepts the AST generated by the parser and constructs a usable code representation that can be executed
 	by the interpreter.
-"""
\ No newline at end of file
+"""
+import os
+import re
+import sys
+
+# The interpreter package sits beside the compiler rather than on the path of scripts run from here
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import lexer as tslexer
+import parser
+import optimizer
+import interpreter
+
+opcodes = interpreter.v1.opcodes
+
+class CompilerError(StandardError):
+    """
+        A class representing an AST that cannot be compiled.
+    """
+
+ESCAPE_PATTERN = re.compile(r"\\(x[0-9A-Fa-f]{2}|c[0-9rpo]|[nrt\\\"'])")
+"""
+    Matches the escape sequences collapsed in string literals.
+"""
+
+ESCAPE_CHARACTERS = {
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "\\": "\\",
+    "\"": "\"",
+    "'": "'",
+    # Color codes skip over the bytes used by \b, \t, \n and \r
+    "c0": "\x01", "c1": "\x02", "c2": "\x03", "c3": "\x04", "c4": "\x05",
+    "c5": "\x06", "c6": "\x07", "c7": "\x0b", "c8": "\x0c", "c9": "\x0e",
+    "cr": "\x0f", "cp": "\x10", "co": "\x11",
+}
+"""
+    A dictionary mapping escape sequences, without their backslash, to the character they stand for. Hex escapes are
+    handled separately.
+"""
+
+def collapse_escapes(string):
+    """
+        Replaces the escape sequences in a string literal with the characters they stand for, as the engine does when
+        compiling. Unknown escape sequences are left as written.
+
+        :param string: The string literal without its quotes.
+        :rtype: str
+        :return: The collapsed string.
+    """
+    if "\\" not in string:
+        return string
+
+    def replace_escape(match):
+        escape_sequence = match.group(1)
+        if escape_sequence[0] == "x":
+            return chr(int(escape_sequence[1:], 16))
+        return ESCAPE_CHARACTERS[escape_sequence]
+    return ESCAPE_PATTERN.sub(replace_escape, string)
+
+class Compiler(object):
+    """
+        Lowers AST elements into the opcodes of a v2 code block. Each expression leaves its value on the stack and each
+        statement cleans up after itself.
+    """
+
+    MAXIMUM_STRING_TABLE_SIZE = 0xFFFF
+    """
+        The number of string table entries addressable by PushString.
+    """
+
+    MAXIMUM_IMMEDIATE = 0xFFFFFFFF
+    """
+        The largest number that fits in a PushImmediate.
+    """
+
+    code_block = None
+    """
+        The code block being generated.
+    """
+
+    string_indexes = None
+    """
+        A dictionary mapping strings to their index in the string table of the code block.
+    """
+
+    def __init__(self):
+        self.code_block = interpreter.v2.CodeBlock()
+        self.string_indexes = {}
+
+    def get_string_index(self, string):
+        """
+            Looks up the string table index of a string, adding it to the string table if it is not there yet.
+
+            :param string: The string to look up.
+            :rtype: int
+            :return: The index of the string in the string table.
+        """
+        if string not in self.string_indexes:
+            if len(self.code_block.string_table) > self.MAXIMUM_STRING_TABLE_SIZE:
+                raise CompilerError("String table overflow: Only %u strings can be addressed." % (self.MAXIMUM_STRING_TABLE_SIZE + 1))
+
+            self.string_indexes[string] = len(self.code_block.string_table)
+            self.code_block.string_table.append(string)
+        return self.string_indexes[string]
+
+    def push_string(self, string):
+        return opcodes.PushString([self.get_string_index(string)])
+
+    def compile_value(self, input):
+        """
+            Compiles an expression, leaving its value on the stack.
+
+            :param input: A token, AST element or string representing the value.
+            :rtype: list
+            :return: A list of opcodes.
+        """
+        if type(input) is tslexer.Number and input.data.isdigit() and int(input.data) <= self.MAXIMUM_IMMEDIATE:
+            return [opcodes.PushImmediate([int(input.data)])]
+        elif type(input) is tslexer.String:
+            return [self.push_string(collapse_escapes(input.data))]
+        elif isinstance(input, tslexer.Token):
+            # Torque Script has no types beyond strings, so anything else is pushed as written
+            return [self.push_string(input.data)]
+        elif type(input) is str:
+            return [self.push_string(input)]
+        elif type(input) is parser.ObjectInstantiation:
+            return self.compile_object_instantiation(input)
+        elif type(input) is parser.GlobalReference:
+            return [self.push_string(self.get_global_name(input)), opcodes.GetGlobal()]
+        elif type(input) is parser.FunctionCall:
+            return self.compile_function_call(input)
+        raise CompilerError("Cannot compile value of type '%s'." % input.__class__.__name__)
+
+    def get_global_name(self, input):
+        """
+            Generates the name of the variable a global element refers to. Array indexes are folded into the name the way
+            the engine does, so $a[1, 2] refers to $a1_2.
+
+            :param input: The GlobalAssignment or GlobalReference.
+            :rtype: str
+            :return: The variable name.
+        """
+        array_indexes = input.array_indexes if input.array_indexes is not None else []
+        for array_index in array_indexes:
+            if type(array_index) is not str:
+                raise CompilerError("Global '%s' uses an array index that is not a constant." % input.name)
+        return input.name + "_".join(collapse_escapes(array_index) for array_index in array_indexes)
+
+    def get_attribute_values(self, attribute_name, attribute_value, separator=""):
+        """
+            Flattens an attribute assignment with array indexes into plain attribute names, so value[1, 2] is
+            assigned as value1_2.
+
+            :param attribute_name: The name of the attribute, with any array indexes seen so far.
+            :param attribute_value: The value assigned to it, or a dictionary mapping further array indexes to values.
+            :param separator: The separator to place before the next array index.
+            :rtype: list
+            :return: A list of (attribute name, value) tuples.
+        """
+        if type(attribute_value) is not dict:
+            return [(attribute_name, attribute_value)]
+
+        result = []
+        for array_index, array_value in attribute_value.items():
+            result += self.get_attribute_values(attribute_name + separator + array_index, array_value, "_")
+        return result
+
+    def compile_object_instantiation(self, input):
+        """
+            Compiles the creation of an object. The object is left on the stack.
+        """
+        result = [self.push_string(input.type), self.push_string(input.name if input.name is not None else ""), opcodes.CreateInstance()]
+
+        for attribute_name, attribute_value in input.attribute_map.items():
+            for member_name, member_value in self.get_attribute_values(attribute_name, attribute_value):
+                result.append(self.push_string(member_name))
+                result += self.compile_value(member_value)
+                result.append(opcodes.SetMember())
+
+        for child in input.children if input.children is not None else []:
+            result += self.compile_object_instantiation(child)
+            result.append(opcodes.AddObject())
+        return result
+
+    def compile_function_call(self, input):
+        """
+            Compiles a function call. Parameters are pushed in order followed by the function name. The return value is left
+        on the stack.
+        """
+        parameters = input.parameters if input.parameters is not None else []
+        result = []
+        for parameter in parameters:
+            result += self.compile_value(parameter)
+        result += [self.push_string(input.name.lower()), opcodes.CallFunction([len(parameters)])]
+        return result
+
+    def compile_statement(self, input):
+        """
+            Compiles a top level AST element as a statement, leaving nothing behind on the stack.
+
+            :param input: The AST element to compile.
+            :rtype: list
+            :return: A list of opcodes.
+        """
+        if type(input) is parser.ObjectInstantiation:
+            return self.compile_object_instantiation(input) + [opcodes.Pop()]
+        elif type(input) is parser.GlobalAssignment:
+            return [self.push_string(self.get_global_name(input))] + self.compile_value(input.value) + [opcodes.SetGlobal()]
+        elif type(input) is parser.FunctionCall:
+            return self.compile_function_call(input) + [opcodes.Pop()]
+        elif type(input) is parser.GlobalReference:
+            # Reading a global has no side effects
+            return []
+        raise CompilerError("Cannot compile statement of type '%s'." % input.__class__.__name__)
+
+    def compile_function(self, name, elements):
+        """
+            Compiles a list of AST elements into the body of a function in the function table.
+
+            :param name: The name of the function.
+            :param elements: The AST elements making up the function body.
+        """
+        name = name.lower()
+        if name in self.code_block.function_table:
+            raise CompilerError("Function '%s' declared multiple times." % name)
+
+        function_code = []
+        for element in elements:
+            function_code += self.compile_statement(element)
+        self.code_block.function_table[name] = function_code
+
+    def compile(self, root_data):
+        """
+            Compiles the root data of a parsed script into the global code of the code block.
+
+            :param root_data: The root data produced by the parser.
+            :rtype: interpreter.v2.CodeBlock
+            :return: The generated code block.
+        """
+        for element in root_data:
+            self.code_block.global_code += self.compile_statement(element)
+        return self.code_block
+
+def compile_file(path, optimize=True, fold_builtins=False):
+    """
+        Parses and compiles a script file.
+
+        :param path: The path of the script file.
+        :param optimize: Whether or not to run the optimizer over the generated code.
+        :param fold_builtins: Whether or not the optimizer folds calls to pure builtins, see the optimizer module.
+        :rtype: interpreter.v2.CodeBlock
+        :return: The generated code block.
+    """
+    with open(path, "rb") as handle:
+        code_block = Compiler().compile(parser.AST(handle).root_data)
+
+    if optimize is True:
+        optimizer.optimize(code_block, fold_builtins)
+    return code_block
+
+def compile_bundle(paths, optimize=True, fold_builtins=False):
+    """
+        Parses and compiles script files into a single bundle. Each code block is named after the path of its script.
+
+        :param paths: The paths of the script files, in the order they should be registered.
+        :param optimize: Whether or not to run the optimizer over the generated code.
+        :param fold_builtins: Whether or not the optimizer folds calls to pure builtins, see the optimizer module.
+        :rtype: interpreter.Bundle
+        :return: The generated bundle.
+    """
+    bundle = interpreter.Bundle()
+    for path in paths:
+        bundle.code_blocks[path] = compile_file(path, optimize, fold_builtins)
+    return bundle
+
+if __name__ == "__main__":
+    code_block = compile_file(sys.argv[1], optimize=False)
+    print("Optimizer removed %u instructions." % optimizer.optimize(code_block))
+
+    with open(sys.argv[2] if len(sys.argv) > 2 else sys.argv[1] + ".dso", "wb") as writer:
+        code_block.generate_bytes(writer)
@@ -3,58 +3,89 @@
 """
 import re
 import sys
+import mmap
 
 class LexicalError(StandardError):
     pass
 
 class Token(object):
-    data = None
-    line_number = None
+    """
+        A single token of input. Large scripts produce millions of these, so tokens use slots rather than a dictionary:
+
+        data: The text of the token.
+        line_number: The line the token ends on.
+        start_offset: The offset of the first byte of this token in the input.
+        end_offset: The offset just past the last byte of this token in the input.
+    """
+    __slots__ = ["data", "line_number", "start_offset", "end_offset"]
+
+    INTERN = True
+    """
+        Whether or not the text of tokens of this type is interned. Identifiers, operators and the like repeat constantly,
+        so sharing one string for each distinct value saves a string per token.
+    """
 
     def __init__(self, match_data, line_number):
         self.line_number = line_number
         self.data = match_data.group(0) if type(match_data) is not str else match_data
+        self.start_offset = None
+        self.end_offset = None
+
+        if self.INTERN:
+            self.data = intern(self.data)
 
     def __repr__(self):
         return "<%s token: %s on line %u>" % (self.__class__.__name__, repr(self.data), self.line_number)
 
 class ArrayOpen(Token):
+    __slots__ = []
     PATTERN = re.compile("\\[")
 
 class ArrayClose(Token):
+    __slots__ = []
     PATTERN = re.compile("\\]")
 
 class Inheritance(Token):
+    __slots__ = []
     PATTERN = re.compile(":")
 
 class BlockComment(Token):
-    PATTERN = re.compile("/\\*(.*?)\\*/", re.DOTALL)
+    __slots__ = []
+    INTERN = False
+    PATTERN = re.compile("/\\*([\\s\\S]*?)\\*/")
 
     def __init__(self, match_data, line_number):
         super(BlockComment, self).__init__(match_data.group(1), line_number)
 
 class InlineComment(Token):
+    __slots__ = []
+    INTERN = False
     PATTERN = re.compile("//(.*)")
 
     def __init__(self, match_data, line_number):
         super(InlineComment, self).__init__(match_data.group(1), line_number)
 
 class Number(Token):
+    __slots__ = []
     PATTERN = re.compile("(-?[0-9]+(?:\\.[0-9]+)?)")
 
 class ParameterSeperator(Token):
+    __slots__ = []
     PATTERN = re.compile(" *,")
 
 class Identifier(Token):
-    PATTERN = re.compile("((?:(?:[A-Z]|[_])+[0-9]*)+(?:::(?:(?:[A-Z]|[_])+(?:[0-9])*)+)*\\$?)", re.IGNORECASE)
+    __slots__ = []
+    PATTERN = re.compile("((?:(?:[A-Za-z]|[_])+[0-9]*)+(?:::(?:(?:[A-Za-z]|[_])+(?:[0-9])*)+)*\\$?)")
 
 class GlobalReference(Token):
+    __slots__ = []
     PATTERN = re.compile("\\$(\w+(?:::\w+)*)")
 
     def __init__(self, match_data, line_number):
         super(GlobalReference, self).__init__(match_data.group(1), line_number)
 
 class LocalReference(Token):
+    __slots__ = []
     PATTERN = re.compile("%(\w+)")
 
     def __init__(self, match_data, line_number):
@@ -73,59 +104,171 @@ def build_operator_regex():
     return re.compile(built_result)
 
 class Operator(Token):
+    __slots__ = []
     PATTERN = build_operator_regex()
 
 class String(Token):
+    __slots__ = []
     PATTERN = re.compile("(\"|')(.+?)(?<!\\\\)\\1")
 
     def __init__(self, match_data, line_number):
         super(String, self).__init__(match_data.group(2), line_number)
 
 class Terminator(Token):
+    __slots__ = []
     PATTERN = re.compile(" *;")
 
 class WhiteSpace(Token):
+    __slots__ = []
+    INTERN = False
     PATTERN = re.compile("\s+")
 
 class ParenthesesOpen(Token):
+    __slots__ = []
     PATTERN = re.compile("\\(")
 
 class ParenthesesClose(Token):
+    __slots__ = []
     PATTERN = re.compile("\\)")
 
 class BlockOpen(Token):
+    __slots__ = []
     PATTERN = re.compile("{")
 
 class QuestionMark(Token):
+    __slots__ = []
     PATTERN = re.compile("\\?")
 
 class BlockClose(Token):
+    __slots__ = []
     PATTERN = re.compile("}")
 
 class AttributeAccessor(Token):
+    __slots__ = []
     PATTERN = re.compile("\\.")
 
-def generate_token_stream(buffer, ignore_whitespace=False):
-    current_line_number = 1
-    while len(buffer) != 0:
-        produced_match = False
-        for token_type in Token.__subclasses__():
-            match_data = re.match(token_type.PATTERN, buffer)
+def build_token_regex(token_types):
+    """
+        A helper routine to combine the patterns of all token types into a single pattern of named groups so that the
+        input can be scanned in one pass. Token types earlier in the list take priority when several could match.
+
+        :param token_types: A list of token classes to combine, in priority order.
+        :rtype: re.RegexObject
+        :return: The compiled master pattern. The name of the matching group is the name of the matched token class.
+    """
+    pattern_data = []
+    group_offset = 0
+    for token_type in token_types:
+        # Each pattern gains an enclosing group, so back references have to be shifted past every group before it
+        group_offset += 1
+        def shift_group(match_data, group_offset=group_offset):
+            if match_data.group(1) is None:
+                return match_data.group(0)
+            return "\\%u" % (int(match_data.group(1)) + group_offset)
+
+        pattern = re.sub("\\\\([0-9]+)|\\\\.", shift_group, token_type.PATTERN.pattern)
+        pattern_data.append("(?P<%s>%s)" % (token_type.__name__, pattern))
+        group_offset += token_type.PATTERN.groups
+    return re.compile("|".join(pattern_data))
+
+TOKEN_TYPES = {token_type.__name__: token_type for token_type in Token.__subclasses__()}
+"""
+    A dictionary mapping token class names to their token classes.
+"""
+
+TOKEN_PATTERN = build_token_regex(Token.__subclasses__())
+"""
+    The master pattern matching the first token of the input.
+"""
+
+def build_following_patterns(token_types):
+    """
+        A helper routine to generate the master pattern used after each token type. The original lexer tried every token
+        type in turn on the rest of the input, carrying on down the list after a match rather than starting over. So after
+        a token, the types listed after its own are tried first, which is what makes 5-3 lex as a subtraction rather than
+        5 followed by -3. Rotating the list this way keeps the token stream identical to that of the original lexer.
+
+        :param token_types: A list of token classes, in priority order.
+        :rtype: dict
+        :return: A dictionary mapping each token class to the master pattern for the token after it.
+    """
+    result = {}
+    for type_index, token_type in enumerate(token_types):
+        result[token_type] = build_token_regex(token_types[type_index + 1:] + token_types[:type_index + 1])
+    return result
+
+FOLLOWING_PATTERNS = build_following_patterns(Token.__subclasses__())
+"""
+    A dictionary mapping token classes to the master pattern matching the token after one of that class.
+"""
+
+def map_file(handle):
+    """
+        Maps an open file into memory so that it can be scanned in place. Files that cannot be mapped, such as empty files
+        or pipes, are read in whole instead.
 
-            if match_data is not None:
-                produced_match = True
-                current_line_number += len(re.findall("(?:\r\n)|\n", buffer[0:match_data.end()]))
+        :param handle: The open file to map.
+        :rtype: mmap.mmap or str
+        :return: A read only mapping of the file, or its contents if it could not be mapped.
+    """
+    try:
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, EnvironmentError):
+        return handle.read()
 
-                if token_type is not WhiteSpace or ignore_whitespace is False:
-                    yield token_type(match_data, current_line_number)
-                buffer = buffer[match_data.end():]
+def generate_token_stream(buffer, ignore_whitespace=False, position=0, line_number=1, previous_type=None):
+    """
+        Produces tokens from the input buffer, scanning it by position with the master token patterns. The buffer is never
+        sliced or copied, so memory mapped input is tokenized in place.
+
+        :param buffer: The input to tokenize. This may be a string, an mmap or an open file.
+        :param ignore_whitespace: Whether or not whitespace tokens should be left out of the stream.
+        :param position: The offset to begin tokenizing at. This must lie on a token boundary.
+        :param line_number: The line number at the given offset.
+        :param previous_type: The class of the token ending at the given offset, or None at the start of the input.
+    """
+    if type(buffer) is file:
+        buffer = map_file(buffer)
+
+    buffer_length = len(buffer)
+    current_line_number = line_number
+    token_pattern = TOKEN_PATTERN if previous_type is None else FOLLOWING_PATTERNS[previous_type]
+    while position != buffer_length:
+        match_data = token_pattern.match(buffer, position)
+
+        if match_data is None:
+            print(buffer[position:position + 100])
+            raise LexicalError("!!! Failed to match next token on line %u!" % current_line_number)
+
+        token_type = TOKEN_TYPES[match_data.lastgroup]
+        match_end = match_data.end()
+        # Count lines by searching in place, mmaps have no count
+        newline_index = buffer.find("\n", position, match_end)
+        while newline_index != -1:
+            current_line_number += 1
+            newline_index = buffer.find("\n", newline_index + 1, match_end)
+
+        if token_type is not WhiteSpace or ignore_whitespace is False:
+            # Re-run the winning pattern alone so the token sees the group numbering it was written against
+            token_data = token_type(token_type.PATTERN.match(buffer, position), current_line_number)
+            token_data.start_offset = position
+            token_data.end_offset = match_end
+            yield token_data
+        position = match_end
+        token_pattern = FOLLOWING_PATTERNS[token_type]
+
+def generate_file_token_stream(path, ignore_whitespace=False):
+    """
+        Produces tokens from the script file at the given path. The file is memory mapped rather than read in.
 
-        if produced_match is False and len(buffer) != 0:
-            print(buffer[0:100])
-            raise LexicalError("!!! Failed to match next token!")
+        :param path: The path of the script file to tokenize.
+        :param ignore_whitespace: Whether or not whitespace tokens should be left out of the stream.
+    """
+    with open(path, "rb") as handle:
+        for token_data in generate_token_stream(handle, ignore_whitespace):
+            yield token_data
 
 if __name__ == "__main__":
-    with open(sys.argv[1], "r") as handle:
-        with open("lexout.txt", "w") as writer:
-            for token_data in generate_token_stream(handle.read()):
-                writer.write(str(token_data) + "\n")
+    with open("lexout.txt", "w") as writer:
+        for token_data in generate_file_token_stream(sys.argv[1]):
+            writer.write(str(token_data) + "\n")
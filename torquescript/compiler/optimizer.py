@@ -0,0 +1,209 @@
+"""
+    Peephole optimizer for v1 code blocks. This folds arithmetic on constants and removes values that are pushed only
+    to be discarded.
+
+    Calls to pure builtins on constants can be folded too, but only on request. Script functions from any code block,
+    bundle or package replace builtins of the same name at runtime, and a folded call never reaches such an override.
+    Only fold builtins when every script that will be loaded alongside is known not to override them.
+"""
+import interpreter
+
+opcodes = interpreter.v1.opcodes
+
+class ConstantMachine(object):
+    """
+        A stand in for the interpreter used to evaluate opcodes and builtins on constant values at compile time.
+    """
+
+    stack = None
+    """
+        The values being operated on.
+    """
+
+    def __init__(self, stack):
+        self.stack = stack
+
+class Optimizer(object):
+    """
+        Optimizes the opcodes of a code block in place. Rules are applied to the tail of the output as each opcode is
+        added, so a folded value can take part in further folding straight away.
+    """
+
+    CONSTANT_OPCODES = [opcodes.PushString, opcodes.PushImmediate]
+    """
+        Opcodes that push a value known at compile time.
+    """
+
+    ARITHMETIC_OPCODES = [opcodes.Add, opcodes.Subtract]
+    """
+        Opcodes that take two values and push one, without side effects.
+    """
+
+    MAXIMUM_STRING_TABLE_SIZE = 0xFFFF
+    """
+        The number of string table entries addressable by PushString.
+    """
+
+    code_block = None
+    """
+        The code block being optimized.
+    """
+
+    string_indexes = None
+    """
+        A dictionary mapping strings to their index in the string table of the code block.
+    """
+
+    fold_builtins = None
+    """
+        Whether or not calls to pure builtins on constants are folded, as described in the module documentation.
+    """
+
+    def __init__(self, code_block, fold_builtins=False):
+        self.code_block = code_block
+        self.fold_builtins = fold_builtins
+        self.string_indexes = {}
+        for string_index, string in enumerate(code_block.string_table):
+            self.string_indexes.setdefault(string, string_index)
+
+    def optimize(self):
+        """
+            Optimizes the global code and every function of the code block.
+
+            :rtype: int
+            :return: The number of instructions removed.
+        """
+        removed_count = 0
+
+        optimized_code = self.optimize_code(self.code_block.global_code)
+        removed_count += len(self.code_block.global_code) - len(optimized_code)
+        self.code_block.global_code = optimized_code
+
+        for function_name, function_code in self.code_block.function_table.items():
+            optimized_code = self.optimize_code(function_code)
+            removed_count += len(function_code) - len(optimized_code)
+            self.code_block.function_table[function_name] = optimized_code
+        return removed_count
+
+    def optimize_code(self, code):
+        """
+            Optimizes a list of opcodes.
+
+            :param code: The opcodes to optimize.
+            :rtype: list
+            :return: A new list of opcodes.
+        """
+        result = []
+        for current_opcode in code:
+            result.append(current_opcode)
+            while len(result) != 0 and self.reduce(result):
+                pass
+        return result
+
+    def reduce(self, code):
+        """
+            Applies the first rule that matches the tail of a list of opcodes.
+
+            :param code: The opcodes generated so far. This is modified in place.
+            :rtype: bool
+            :return: True if a rule was applied.
+        """
+        last_opcode = code[-1]
+
+        # A constant or a global read that is thrown away right after does nothing
+        if type(last_opcode) is opcodes.Pop and len(code) >= 2:
+            if type(code[-2]) in self.CONSTANT_OPCODES:
+                del code[-2:]
+                return True
+            elif type(code[-2]) is opcodes.GetGlobal and len(code) >= 3 and type(code[-3]) in self.CONSTANT_OPCODES:
+                del code[-3:]
+                return True
+        elif type(last_opcode) in self.ARITHMETIC_OPCODES:
+            return self.fold(code, 2, last_opcode.execute)
+        elif self.fold_builtins is True and type(last_opcode) is opcodes.CallFunction and len(code) >= 2 and type(code[-2]) in self.CONSTANT_OPCODES:
+            function_name = str(self.get_constant(code[-2])).lower()
+            builtin = interpreter.builtins.BUILTIN_FUNCTIONS.get(function_name)
+            argument_count = last_opcode.parameters[0]
+
+            # Functions declared by this block take precedence over the builtins
+            if builtin is not None and builtin.pure is True and function_name not in self.code_block.function_table and builtin.minimum_arguments <= argument_count <= len(builtin.argument_types):
+                def evaluate(machine, code_block):
+                    machine.stack[:] = [builtin.call(machine, list(machine.stack))]
+                return self.fold(code, argument_count + 1, evaluate, parameter_count=argument_count)
+        return False
+
+    def fold(self, code, operand_count, evaluate, parameter_count=None):
+        """
+            Replaces an operation at the end of a list of opcodes with its result, if all of its operands are constant.
+
+            :param code: The opcodes generated so far. This is modified in place.
+            :param operand_count: The number of constant pushes the operation consumes.
+            :param evaluate: A callable taking a machine and the code block that performs the operation.
+            :param parameter_count: The number of operands left on the stack for evaluate, if fewer than operand_count.
+            :rtype: bool
+            :return: True if the operation was folded.
+        """
+        operands = code[-operand_count - 1:-1]
+        if len(operands) != operand_count or any(type(operand) not in self.CONSTANT_OPCODES for operand in operands):
+            return False
+
+        values = [interpreter.value.from_python(self.get_constant(operand)) for operand in operands]
+        machine = ConstantMachine(values[:parameter_count] if parameter_count is not None else values)
+        try:
+            evaluate(machine, self.code_block)
+        except (ValueError, TypeError, IndexError):
+            # Leave anything that fails at compile time to fail the same way at runtime
+            return False
+
+        if len(machine.stack) != 1:
+            return False
+
+        folded_opcode = self.make_constant(machine.stack[0])
+        if folded_opcode is None:
+            return False
+
+        code[-operand_count - 1:] = [folded_opcode]
+        return True
+
+    def get_constant(self, input):
+        """
+            Gets the value pushed by a constant opcode.
+        """
+        if type(input) is opcodes.PushString:
+            return self.code_block.string_table[input.parameters[0]]
+        return input.parameters[0]
+
+    def make_constant(self, value):
+        """
+            Generates an opcode pushing a constant value.
+
+            :param value: The value to push, as described in interpreter.value.
+            :rtype: interpreter.v1.opcodes.PushString
+            :return: The generated opcode, or None if the value can't be stored as a constant or the string table is full.
+        """
+        value_string = interpreter.value.get_string(value)
+
+        # Scripts see floats in their short form, which only stands in for the computed value if it reads back the same
+        if type(value) is float and float(value_string) != value:
+            return None
+        value = value_string
+
+        if value not in self.string_indexes:
+            if len(self.code_block.string_table) > self.MAXIMUM_STRING_TABLE_SIZE:
+                return None
+
+            self.string_indexes[value] = len(self.code_block.string_table)
+            self.code_block.string_table.append(value)
+        return opcodes.PushString([self.string_indexes[value]])
+
+def optimize(code_block, fold_builtins=False):
+    """
+        Optimizes a code block in place.
+
+        :param code_block: The code block to optimize.
+        :param fold_builtins: Whether or not to fold calls to pure builtins on constants. This is only safe if no script
+        overrides them.
+        :rtype: int
+        :return: The number of instructions removed.
+    """
+    return Optimizer(code_block, fold_builtins).optimize()
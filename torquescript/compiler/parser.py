@@ -1,7 +1,15 @@
 import sys
+import mmap
+import bisect
 import collections
 
-import tslexer
+import lexer as tslexer
+
+PARSER_VERSION = 1
+"""
+    The version of the AST produced by this parser. This must be bumped whenever the shape of the AST changes so that
+    cached parse results are discarded.
+"""
 
 class ParserError(StandardError):
     """
@@ -13,11 +21,17 @@ class SyntaxError(ParserError):
         Input is syntactically incorrect.
     """
 
+    line_number = None
+    """
+        The line number the error occurred on, or None if it occurred at the end of the input.
+    """
+
     def __init__(self, input_token, expected=None, message=None):
         # Ensure the expected parameter is always a list
-        if type(expected) is not list:
+        if expected is not None and type(expected) is not list:
             expected = [expected]
 
+        self.line_number = input_token.line_number if input_token is not None else None
         output_message = "Syntax error on line %s. " % (input_token.line_number if input_token is not None else "(EOF)")
         if expected is not None:
             expected = ", ".join([expected_type.__name__ if expected_type is not str else expected_type for expected_type in expected ])
@@ -30,15 +44,34 @@ class SyntaxError(ParserError):
         super(SyntaxError, self).__init__(output_message)
 
 class ASTElement(object):
-    commenting = None
     """
-         A list of comments associated with this AST element.
+        Base class of all AST elements. Elements use slots rather than a dictionary to keep large trees small:
+
+        commenting: A list of comments associated with this AST element.
+    """
+    __slots__ = ["commenting"]
+
+    FIELDS = ["commenting"]
+    """
+        The names of the constructor parameters that fully describe this AST element, used for serialization.
     """
 
     def __init__(self, commenting=None):
         self.commenting = commenting
 
 class ObjectInstantiation(ASTElement):
+    """
+        A new object being created:
+
+        type: The class name of the object.
+        name: The name given to the object, or None.
+        attribute_map: A dictionary mapping attribute names to the values assigned to them.
+        children: A list of objects created inside of this one.
+    """
+    __slots__ = ["type", "name", "attribute_map", "children"]
+
+    FIELDS = ["type", "name", "attribute_map", "children", "commenting"]
+
     def __init__(self, type, name, attribute_map, children=None, commenting=None):
         super(ObjectInstantiation, self).__init__(commenting=commenting)
 
@@ -57,15 +90,16 @@ class ObjectInstantiation(ASTElement):
         """ % (("/*\n%s\n*/" % "\n".join(self.commenting) if len(self.commenting) != 0 else ""), self.type, self.name, "\n".join(["%s=%s" % (attribute_name, attribute_value) for attribute_name, attribute_value in zip(self.attribute_map.keys(), self.attribute_map.values())]))
 
 class GlobalAssignment(ASTElement):
-    name = None
-    """
-        The name given to this global.
     """
+        A value being assigned to a global:
 
-    value = None
-    """
-        The value given to this global.
+        name: The name given to this global.
+        value: The value given to this global.
+        array_indexes: A list of the array indexes being assigned to.
     """
+    __slots__ = ["name", "value", "array_indexes"]
+
+    FIELDS = ["name", "value", "array_indexes", "commenting"]
 
     def __init__(self, name, value, array_indexes=None, commenting=None):
         super(GlobalAssignment, self).__init__(commenting=commenting)
@@ -75,12 +109,15 @@ class GlobalAssignment(ASTElement):
         self.array_indexes = array_indexes
 
 class GlobalReference(ASTElement):
-    name = None
     """
-        The name given to this global.
+        A global being read:
+
+        name: The name given to this global.
+        array_indexes: A list of the array indexes being read.
     """
+    __slots__ = ["name", "array_indexes"]
 
-    array_indexes = None
+    FIELDS = ["name", "array_indexes"]
 
     def __init__(self, name, array_indexes=None):
         super(GlobalReference, self).__init__()
@@ -88,21 +125,78 @@ class GlobalReference(ASTElement):
         self.array_indexes = array_indexes
 
 class FunctionCall(ASTElement):
-    name = None
-    """
-        The name of the function being called.
     """
+        A function being called:
 
-    parameters = None
-    """
-        Parameters being passed to this function.
+        name: The name of the function being called.
+        parameters: Parameters being passed to this function.
     """
+    __slots__ = ["name", "parameters"]
+
+    FIELDS = ["name", "parameters"]
 
     def __init__(self, name, parameters=None):
         super(FunctionCall, self).__init__()
         self.name = name
         self.parameters = parameters
 
+ELEMENT_TYPES = {element_type.__name__: element_type for element_type in [ObjectInstantiation, GlobalAssignment, GlobalReference, FunctionCall]}
+"""
+    A dictionary mapping AST element class names to their classes.
+"""
+
+ELEMENT_TAG = 0
+TOKEN_TAG = 1
+ORDERED_MAP_TAG = 2
+MAP_TAG = 3
+
+def serialize_tree(input):
+    """
+        Converts AST data into nested tuples, lists and strings only, so that it is cheap to pickle or marshal. Elements,
+        tokens and maps are stored as tuples led by a tag naming what they were.
+
+        :param input: The AST data to serialize, usually a root_data list.
+        :return: The serialized form of the data.
+    """
+    if isinstance(input, ASTElement):
+        return (ELEMENT_TAG, input.__class__.__name__, [serialize_tree(getattr(input, field_name)) for field_name in input.FIELDS])
+    elif isinstance(input, tslexer.Token):
+        return (TOKEN_TAG, input.__class__.__name__, input.data, input.line_number, input.start_offset, input.end_offset)
+    elif isinstance(input, dict):
+        tag = ORDERED_MAP_TAG if isinstance(input, collections.OrderedDict) else MAP_TAG
+        return (tag, [(key, serialize_tree(value)) for key, value in input.items()])
+    elif isinstance(input, list):
+        return [serialize_tree(value) for value in input]
+    return input
+
+def deserialize_tree(input):
+    """
+        Rebuilds AST data from the output of serialize_tree without running the lexer.
+
+        :param input: The serialized data.
+        :return: The AST data it was serialized from.
+    """
+    if type(input) is list:
+        return [deserialize_tree(value) for value in input]
+    elif type(input) is not tuple:
+        return input
+
+    if input[0] == ELEMENT_TAG:
+        element_type = ELEMENT_TYPES[input[1]]
+        return element_type(**dict(zip(element_type.FIELDS, [deserialize_tree(value) for value in input[2]])))
+    elif input[0] == TOKEN_TAG:
+        # Token subclasses expect match data, so only run the base constructor with the stored string
+        token = tslexer.Token.__new__(tslexer.TOKEN_TYPES[input[1]])
+        tslexer.Token.__init__(token, input[2], input[3])
+        token.start_offset = input[4]
+        token.end_offset = input[5]
+        return token
+
+    result = collections.OrderedDict() if input[0] == ORDERED_MAP_TAG else {}
+    for key, value in input[1]:
+        result[key] = deserialize_tree(value)
+    return result
+
 class AST(object):
     current_enclosure = None
     """
@@ -235,6 +329,7 @@ class AST(object):
                 next_token = next(token_stream)
                 if type(next_token) is not tslexer.Terminator:
                     raise SyntaxError(next_token, expected=tslexer.Terminator)
+            return current_result
 
         return process_global(input_token, token_stream)
 
@@ -410,21 +505,200 @@ class AST(object):
         self.root_data = self.parse(input)
 
     def parse(self, input):
-        if type(input) is str:
+        """
+            Parses the input into a list of top level AST elements. Tokens are pulled from the lexer as they are needed, so
+            memory mapped and file input is never read in whole.
+
+            :param input: A string, mmap or open file to parse, or a token stream that has already been generated.
+        """
+        if type(input) is str or type(input) is file or type(input) is mmap.mmap:
             input = tslexer.generate_token_stream(input, ignore_whitespace=True)
 
         result = []
         for token in input:
-            if type(token) not in self.token_handlers:
-                raise ParserError("!!! No handler for token type: '%s'" % token.__class__.__name__)
-            current_result = self.token_handlers[type(token)](self, token, input)
+            current_result = self.parse_statement(token, input)
             if current_result is not None:
                 result.append(current_result)
         return result
 
+    def parse_statement(self, input_token, token_stream):
+        """
+            Parses a single top level statement.
+
+            :param input_token: The first token of the statement.
+            :param token_stream: The token stream to pull the remainder of the statement from.
+            :return: The AST element produced by the statement, or None if it produced nothing.
+        """
+        if type(input_token) not in self.token_handlers:
+            raise ParserError("!!! No handler for token type: '%s'" % input_token.__class__.__name__)
+        return self.token_handlers[type(input_token)](self, input_token, token_stream)
+
+class TokenRecorder(object):
+    """
+        Wraps a token stream, keeping every token that is pulled through it.
+    """
+
+    tokens = None
+    """
+        All tokens pulled so far, in order.
+    """
+
+    def __init__(self, token_stream):
+        self.tokens = []
+        self.token_stream = token_stream
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        token = next(self.token_stream)
+        self.tokens.append(token)
+        return token
+
+    __next__ = next
+
+class IncrementalAST(AST):
+    """
+        An AST over script source that can be edited in place. The tokens and byte spans of the top level elements are
+        kept, so an edit only re-lexes and re-parses from the last stable boundary before the damage up to the first
+        boundary after it that lines up with the old parse.
+
+        A stable boundary is the end of a top level statement closed by a terminator or a block close, with no comments
+        waiting to attach to the next element.
+    """
+
+    BOUNDARY_TOKENS = [tslexer.Terminator, tslexer.BlockClose]
+    """
+        Token types that may close a statement on a stable boundary.
+    """
+
+    source = None
+    """
+        The current script source.
+    """
+
+    tokens = None
+    """
+        Every significant token in the source, in order.
+    """
+
+    spans = None
+    """
+        A list of (start offset, end offset) tuples, one for each element in root_data.
+    """
+
+    boundaries = None
+    """
+        A list of (offset, line number, token count, element count, token type) tuples, one for each stable boundary in the
+        source. The counts are the number of tokens and root_data elements before the boundary, and the token type is the
+        class of the token ending there, or None at the start of the source.
+    """
+
+    boundary_offsets = None
+    """
+        The offset of each boundary, kept alongside the boundaries for bisection.
+    """
+
+    def __init__(self, input):
+        """
+            :param input: The script source to parse. Unlike AST, this must be a string as edits are spliced into it.
+        """
+        self.source = input
+        super(IncrementalAST, self).__init__(input)
+
+    def parse(self, input):
+        self.boundaries = [(0, 1, 0, 0, None)]
+        self.tokens, root_data, self.spans, boundaries, sync_index = self.parse_region(input, self.boundaries[0])
+        self.boundaries += boundaries
+        self.boundary_offsets = [boundary[0] for boundary in self.boundaries]
+        return root_data
+
+    def parse_region(self, source, boundary, damage_end=None, delta=0):
+        """
+            Parses top level statements of the source starting from a stable boundary.
+
+            :param source: The script source to parse.
+            :param boundary: The boundary record to start at.
+            :param damage_end: The offset in the old source where the edited region ended. Parsing stops at the first
+            boundary past it that is also an old boundary. If None, parsing always runs to the end of the source.
+            :param delta: The change in source length caused by the edit.
+            :rtype: tuple
+            :return: A tuple of the tokens, elements, spans and boundaries that were parsed, along with the index of the old
+            boundary that parsing stopped at or None if it ran to the end of the source.
+        """
+        self.current_comments = []
+        token_stream = TokenRecorder(tslexer.generate_token_stream(source, ignore_whitespace=True, position=boundary[0], line_number=boundary[1], previous_type=boundary[4]))
+
+        elements = []
+        spans = []
+        boundaries = []
+        for token in token_stream:
+            current_result = self.parse_statement(token, token_stream)
+            last_token = token_stream.tokens[-1]
+            if current_result is not None:
+                elements.append(current_result)
+                spans.append((token.start_offset, last_token.end_offset))
+
+            if type(last_token) not in self.BOUNDARY_TOKENS or len(self.current_comments) != 0:
+                continue
+
+            # Once we are past the damage and land on an old boundary, the rest of the old parse is still valid
+            if damage_end is not None and last_token.end_offset - delta >= damage_end:
+                sync_index = bisect.bisect_left(self.boundary_offsets, last_token.end_offset - delta)
+                # The old tokens after it were lexed following the token that ended there, so that has to match too
+                if sync_index != len(self.boundary_offsets) and self.boundary_offsets[sync_index] == last_token.end_offset - delta and self.boundaries[sync_index][4] is type(last_token):
+                    return token_stream.tokens, elements, spans, boundaries, sync_index
+            boundaries.append((last_token.end_offset, last_token.line_number, boundary[2] + len(token_stream.tokens), boundary[3] + len(elements), type(last_token)))
+        return token_stream.tokens, elements, spans, boundaries, None
+
+    def edit(self, start, end, text):
+        """
+            Replaces a region of the source and updates the AST to match.
+
+            :param start: The offset of the first byte to replace.
+            :param end: The offset just past the last byte to replace.
+            :param text: The text to put in place of the region.
+            :rtype: list
+            :return: The top level elements that were parsed again and spliced into root_data.
+        """
+        source = self.source[:start] + text + self.source[end:]
+        delta = len(text) - (end - start)
+
+        boundary_index = bisect.bisect_right(self.boundary_offsets, start) - 1
+        boundary = self.boundaries[boundary_index]
+        tokens, elements, spans, boundaries, sync_index = self.parse_region(source, boundary, damage_end=end, delta=delta)
+
+        if sync_index is None:
+            trailing_boundaries = []
+            token_end, element_end = len(self.tokens), len(self.root_data)
+        else:
+            # Everything past the boundary we landed on is shifted rather than parsed again
+            trailing_boundaries = self.boundaries[sync_index:]
+            token_end, element_end = trailing_boundaries[0][2], trailing_boundaries[0][3]
+
+            line_delta = tokens[-1].line_number - trailing_boundaries[0][1]
+            token_delta = len(tokens) - (token_end - boundary[2])
+            element_delta = len(elements) - (element_end - boundary[3])
+            trailing_boundaries = [(offset + delta, line_number + line_delta, token_count + token_delta, element_count + element_delta, token_type) for offset, line_number, token_count, element_count, token_type in trailing_boundaries]
+
+            for token in self.tokens[token_end:]:
+                token.start_offset += delta
+                token.end_offset += delta
+                token.line_number += line_delta
+
+        trailing_spans = [(span_start + delta, span_end + delta) for span_start, span_end in self.spans[element_end:]]
+
+        self.source = source
+        self.tokens = self.tokens[:boundary[2]] + tokens + self.tokens[token_end:]
+        self.root_data = self.root_data[:boundary[3]] + elements + self.root_data[element_end:]
+        self.spans = self.spans[:boundary[3]] + spans + trailing_spans
+        self.boundaries = self.boundaries[:boundary_index + 1] + boundaries + trailing_boundaries
+        self.boundary_offsets = [current_boundary[0] for current_boundary in self.boundaries]
+        return elements
+
 if __name__ == "__main__":
-    with open(sys.argv[1], "r") as handle:
-        result = AST(handle.read())
+    with open(sys.argv[1], "rb") as handle:
+        result = AST(handle)
 
         with open("out.txt", "w") as writer:
             def recurse_test(input, current_depth):
@@ -3,10 +3,13 @@
 """
 
 
+import value
 import builtins
 from opcode import OpCode
 from codeblock import CodeBlock
-from dsodecoder import DSODecoder
+from dsodecoder import DSODecoder, DecoderError
 from interpreter import Interpreter
 
-import v1
\ No newline at end of file
+import v1
+import v2
+from bundle import Bundle
\ No newline at end of file
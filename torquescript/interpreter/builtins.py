@@ -0,0 +1,243 @@
+"""
+	All built in functions.
+"""
+
+import sys
+import math
+
+from value import EMPTY_STRING, get_number, get_string, from_python
+
+class Builtin(object):
+	"""
+		A built in function along with the metadata the interpreter needs to call it. Arguments are converted to the
+		declared types and handed straight to the function, along with the interpreter instance, and its result is
+		converted to the declared return type.
+	"""
+	
+	function = None
+	"""
+		The python function implementing this built in.
+	"""
+	
+	name = None
+	"""
+		The name scripts call this built in by.
+	"""
+	
+	argument_types = None
+	"""
+		A tuple of the types each argument is converted to before being passed.
+	"""
+	
+	return_type = None
+	"""
+		The type the result is converted to, or None if the built in returns nothing.
+	"""
+	
+	minimum_arguments = None
+	"""
+		The fewest arguments this built in accepts. Missing arguments after these are not passed at all.
+	"""
+	
+	pure = None
+	"""
+		Whether or not this built in has no side effects, so that calls with constant arguments can be evaluated at
+		compile time.
+	"""
+	
+	def __init__(self, function, name, argument_types, return_type, minimum_arguments, pure):
+		self.function = function
+		self.name = name
+		self.argument_types = argument_types
+		self.return_type = return_type
+		self.minimum_arguments = minimum_arguments
+		self.pure = pure
+		
+	def call(self, vm, arguments):
+		"""
+			Calls this built in.
+			
+			:param vm: The interpreter instance to execute within the context of.
+			:param arguments: The list of arguments passed by the script.
+			:rtype: object
+			:return: The result, or an empty string if there is none or the wrong number of arguments was passed.
+		"""
+		if len(arguments) < self.minimum_arguments or len(arguments) > len(self.argument_types):
+			print("%s: Expected %u to %u arguments, got %u." % (self.name, self.minimum_arguments, len(self.argument_types), len(arguments)))
+			return EMPTY_STRING
+			
+		result = self.function(vm, *[argument if type(argument) is argument_type else convert_value(argument, argument_type) for argument, argument_type in zip(arguments, self.argument_types)])
+		if self.return_type is None:
+			return EMPTY_STRING
+		elif type(result) is not self.return_type:
+			result = convert_value(result, self.return_type)
+		return from_python(result)
+		
+BUILTIN_FUNCTIONS = {}
+"""
+	A dictionary mapping lowercase built in names to their Builtin, filled in once as built ins are declared.
+"""
+
+def convert_value(value, value_type):
+	"""
+		Converts a script value to a python type. Strings that don't start with a number read as zero, as they do in the
+		engine.
+		
+		:param value: The value to convert, as described in the value module, or a plain python value.
+		:param value_type: The type to convert to. This is one of str, float or int, or a class with a from_value class
+		method performing the conversion.
+		:rtype: object
+		:return: The converted value.
+	"""
+	if value_type is str:
+		return get_string(value)
+	elif value_type is float:
+		return get_number(value)
+	elif value_type is int:
+		number = get_number(value)
+		
+		# Anything that isn't a finite number has no integer form, so it reads as zero
+		if math.isnan(number) or math.isinf(number):
+			return 0
+		return int(number)
+	elif hasattr(value_type, "from_value"):
+		return value_type.from_value(value)
+		
+	try:
+		return value_type(value)
+	except ValueError:
+		try:
+			return value_type(float(value))
+		except ValueError:
+			return value_type(0)
+	
+def builtin(argument_types=(), return_type=None, minimum_arguments=None, pure=False, name=None):
+	"""
+		Declares a python function as a built in. The function is called with the interpreter instance followed by the
+		converted arguments.
+		
+		:param argument_types: A tuple of the types each argument is converted to.
+		:param return_type: The type the result is converted to, or None if the built in returns nothing.
+		:param minimum_arguments: The fewest arguments accepted. Defaults to all of them.
+		:param pure: Whether or not the built in has no side effects.
+		:param name: The name scripts call the built in by. Defaults to the name of the function.
+	"""
+	def register(function):
+		builtin_name = name if name is not None else function.__name__
+		BUILTIN_FUNCTIONS[builtin_name.lower()] = Builtin(function, builtin_name, tuple(argument_types), return_type, minimum_arguments if minimum_arguments is not None else len(argument_types), pure)
+		return function
+	return register
+
+@builtin((str,))
+def echo(vm, text):
+	"""
+		Prints a string to the console.
+	"""
+	print(text)
+	
+@builtin((str,))
+def error(vm, text):
+	"""
+		Prints an error to the console.
+	"""
+	print(text)
+	
+@builtin((str,), int)
+def nameToID(vm, name):
+	"""
+		Looks up the identifier of an object, or -1 if there is no such object.
+	"""
+	sim_object = vm.get_object(name)
+	if sim_object is None:
+		return -1
+	return sim_object.identifier
+	
+@builtin((str,), int)
+def isObject(vm, name):
+	"""
+		Returns 1 if an object exists, 0 otherwise.
+	"""
+	if vm.get_object(name) is None:
+		return 0
+	return 1
+	
+@builtin((str,))
+def activatePackage(vm, name):
+	"""
+		Activates a package, so its functions override those defined so far.
+	"""
+	if vm.activate_package(name) is False:
+		print("activatePackage: Unable to find package '%s'." % name)
+		
+@builtin((str,))
+def deactivatePackage(vm, name):
+	"""
+		Deactivates a package.
+	"""
+	vm.deactivate_package(name)
+	
+@builtin((str,), int)
+def isActivePackage(vm, name):
+	"""
+		Returns 1 if a package is active, 0 otherwise.
+	"""
+	if vm.get_lowercase(name) in vm.active_packages:
+		return 1
+	return 0
+	
+MAXIMUM_SCHEDULE_ARGUMENTS = 17
+"""
+	The most arguments schedule passes on to the scheduled function.
+"""
+
+@builtin((float, str, str) + (str,) * MAXIMUM_SCHEDULE_ARGUMENTS, int, minimum_arguments=3)
+def schedule(vm, delay, reference_object, function_name, *arguments):
+	"""
+		Calls a function after a delay in milliseconds and returns the identifier of the event. The call is cancelled
+		if the reference object is deleted first, no object is passed as 0.
+	"""
+	sim_object = vm.get_object(reference_object)
+	if sim_object is None and reference_object not in ("", "0"):
+		print("schedule: Unable to find reference object '%s'." % reference_object)
+		return 0
+	return vm.schedule(delay, function_name, [from_python(argument) for argument in arguments], sim_object)
+	
+@builtin((int,))
+def cancel(vm, event_identifier):
+	"""
+		Cancels a scheduled event.
+	"""
+	vm.cancel_event(event_identifier)
+	
+@builtin((int,), int)
+def isEventPending(vm, event_identifier):
+	"""
+		Returns 1 if a scheduled event has not run or been cancelled yet, 0 otherwise.
+	"""
+	if vm.get_event(event_identifier) is None:
+		return 0
+	return 1
+	
+@builtin((int,), int)
+def getEventTimeLeft(vm, event_identifier):
+	"""
+		Returns the milliseconds until a scheduled event runs, or 0 if it is not pending.
+	"""
+	event = vm.get_event(event_identifier)
+	if event is None:
+		return 0
+	return event.time - vm.current_time
+	
+@builtin((), int)
+def getSimTime(vm):
+	"""
+		Returns the simulation time in milliseconds.
+	"""
+	return vm.current_time
+	
+@builtin()
+def quit(vm):
+	"""
+		Causes an interpreter exit.
+	"""
+	sys.exit(0)
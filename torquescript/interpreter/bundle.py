@@ -0,0 +1,177 @@
+"""
+	Bundles of compiled code blocks. A bundle stores many code blocks in one file with a single, deduplicated string
+	table and an index of every function, so that a whole mod can be opened with one mapping and one index read.
+"""
+
+import io
+import struct
+import collections
+
+import v1
+import v2
+from dsodecoder import DSODecoder, DecoderError, map_file
+
+class Bundle(DSODecoder):
+	"""
+		A collection of named code blocks stored together. Loaded code blocks share the bundle's byte data and string
+		table, and decode their functions on first use like version two code blocks.
+		
+		The layout is the bundle identifier, the string table entry count and byte length, the string table, the code
+		block count and then one entry per code block. Each entry is the NULL terminated code block name, its global
+		code offset and byte length, its function count and then the NULL terminated name, offset and byte length of
+		each function. All offsets are from the start of the file.
+	"""
+	BUNDLE_IDENTIFIER = 0x6c646e62
+	
+	MAXIMUM_STRING_TABLE_SIZE = 0xFFFF
+	"""
+		The number of string table entries addressable by PushString.
+	"""
+	
+	code_blocks = None
+	"""
+		An ordered dictionary mapping code block names, usually their script paths, to the code blocks.
+	"""
+	
+	def __init__(self, byte_data=None):
+		super(Bundle, self).__init__(byte_data)
+		self.code_blocks = collections.OrderedDict()
+		
+		if byte_data is not None:
+			self.load(byte_data)
+			
+	def load(self, byte_data):
+		# Initialize from a file handle, mapping it rather than reading it in
+		if type(byte_data) is file:
+			byte_data = map_file(byte_data)
+		self.byte_data = byte_data
+		self.byte_index = 0
+		
+		if self.read_fixed_bytes(int) != self.BUNDLE_IDENTIFIER:
+			raise DecoderError("Not a code block bundle.")
+			
+		string_table_entry_count = self.read_fixed_bytes(int)
+		string_table_length = self.read_fixed_bytes(int)
+		
+		# Every entry is NULL terminated, so the last split is always empty
+		self.string_table = self.byte_data[self.byte_index:self.byte_index + string_table_length].split("\x00")
+		if self.string_table.pop() != "" or len(self.string_table) != string_table_entry_count:
+			raise DecoderError("Failed to load string table: Expected %u entries. Found %u." % (string_table_entry_count, len(self.string_table)))
+		self.byte_index += string_table_length
+		
+		for code_block_index in range(self.read_fixed_bytes(int)):
+			code_block_name = self.read_variable_bytes()
+			global_code_location = v2.CodeBlock.LOCATION_STRUCT.unpack_from(self.byte_data, self.byte_index)
+			self.byte_index += v2.CodeBlock.LOCATION_STRUCT.size
+			
+			function_index = {}
+			for function_index_entry in range(self.read_fixed_bytes(int)):
+				function_name = self.read_variable_bytes().lower()
+				function_index[function_name] = v2.CodeBlock.LOCATION_STRUCT.unpack_from(self.byte_data, self.byte_index)
+				self.byte_index += v2.CodeBlock.LOCATION_STRUCT.size
+				
+			code_block = v2.CodeBlock()
+			code_block.byte_data = self.byte_data
+			code_block.string_table = self.string_table
+			code_block.function_index = function_index
+			code_block.global_code = code_block.read_code(*global_code_location)
+			self.code_blocks[code_block_name] = code_block
+			
+	def get_string_indexes(self):
+		"""
+			Builds the shared string table for the code blocks in this bundle.
+			
+			:rtype: tuple
+			:return: A tuple of the shared string table and a list holding, for each code block, a list mapping its string
+			table indexes to shared ones.
+		"""
+		string_table = []
+		string_indexes = {}
+		string_index_maps = []
+		for code_block in self.code_blocks.values():
+			string_index_map = []
+			for string_table_entry in code_block.string_table:
+				if string_table_entry not in string_indexes:
+					if len(string_table) > self.MAXIMUM_STRING_TABLE_SIZE:
+						raise DecoderError("String table overflow: Only %u strings can be addressed." % (self.MAXIMUM_STRING_TABLE_SIZE + 1))
+						
+					string_indexes[string_table_entry] = len(string_table)
+					string_table.append(string_table_entry)
+				string_index_map.append(string_indexes[string_table_entry])
+			string_index_maps.append(string_index_map)
+		return (string_table, string_index_maps)
+		
+	def remap_code(self, code, string_index_map):
+		"""
+			Rewrites the string table references of a list of opcodes to point into the shared string table.
+			
+			:param code: The list of opcodes to rewrite.
+			:param string_index_map: A list mapping the string table indexes of the code to shared ones.
+			:rtype: list
+			:return: A new list of opcodes.
+		"""
+		result = []
+		for current_opcode in code:
+			if type(current_opcode) is v1.opcodes.PushString:
+				current_opcode = v1.opcodes.PushString([string_index_map[current_opcode.parameters[0]]])
+			result.append(current_opcode)
+		return result
+		
+	def generate_bytes(self, writer=None):
+		"""
+			Serializes this bundle.
+			
+			:param writer: A file like object to stream the bundle to. If this is None, the bundle is returned instead.
+			:rtype: str
+			:return: The bundle, or None if it was written to writer.
+		"""
+		if writer is not None:
+			self.write_bytes(writer)
+			return None
+			
+		writer = io.BytesIO()
+		self.write_bytes(writer)
+		return writer.getvalue()
+		
+	def write_bytes(self, writer):
+		"""
+			Writes this bundle to a file like object.
+			
+			:param writer: The file like object to write to.
+		"""
+		string_table, string_index_maps = self.get_string_indexes()
+		string_table_data = "".join(["%s\x00" % string_table_entry for string_table_entry in string_table])
+		
+		# Lay out the code first so that the index can point at it
+		code_writer = io.BytesIO()
+		index_data = []
+		for (code_block_name, code_block), string_index_map in zip(self.code_blocks.items(), string_index_maps):
+			code_start = code_writer.tell()
+			code_block.write_code(code_writer, self.remap_code(code_block.global_code, string_index_map))
+			global_code_location = (code_start, code_writer.tell() - code_start)
+			
+			function_locations = []
+			for function_name, function_code in code_block.function_table.items():
+				code_start = code_writer.tell()
+				code_block.write_code(code_writer, self.remap_code(function_code, string_index_map))
+				function_locations.append((function_name, code_start, code_writer.tell() - code_start))
+			index_data.append((code_block_name, global_code_location, function_locations))
+			
+		# The code follows the header, the string table and the index
+		location_size = v2.CodeBlock.LOCATION_STRUCT.size
+		code_offset = 4 * 4 + len(string_table_data)
+		for code_block_name, global_code_location, function_locations in index_data:
+			code_offset += len(code_block_name) + 1 + location_size + 4
+			code_offset += sum([len(function_name) + 1 + location_size for function_name, code_start, code_length in function_locations])
+			
+		writer.write(struct.pack("<III", self.BUNDLE_IDENTIFIER, len(string_table), len(string_table_data)))
+		writer.write(string_table_data)
+		writer.write(struct.pack("<I", len(index_data)))
+		for code_block_name, global_code_location, function_locations in index_data:
+			writer.write("%s\x00" % code_block_name)
+			writer.write(v2.CodeBlock.LOCATION_STRUCT.pack(code_offset + global_code_location[0], global_code_location[1]))
+			writer.write(struct.pack("<I", len(function_locations)))
+			for function_name, code_start, code_length in function_locations:
+				writer.write("%s\x00" % function_name)
+				writer.write(v2.CodeBlock.LOCATION_STRUCT.pack(code_offset + code_start, code_length))
+		writer.write(code_writer.getvalue())
@@ -3,4 +3,5 @@
 """
 
 from simobject import SimObject
-from scriptobject import ScriptObject
\ No newline at end of file
+from scriptobject import ScriptObject
+from simset import SimSet, SimGroup
\ No newline at end of file
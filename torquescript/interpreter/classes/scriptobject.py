@@ -1,12 +1,23 @@
 from simobject import SimObject
+from interpreter.value import get_string
 
 class ScriptObject(SimObject):
 	@SimObject.Field
 	def classname(instance, value):
-		# FIXME: Need to link functions to this script object
-		return value
+		instance.field_values["classname"] = value
+		instance.virtual_machine.link_namespace(instance)
+		return value
 		
 	@SimObject.Field
 	def superclass(instance, value):
-		# FIXME: Need to link functions to this script object
-		return value
\ No newline at end of file
+		instance.field_values["superclass"] = value
+		instance.virtual_machine.link_namespace(instance)
+		return value
+		
+	def get_namespace_names(self):
+		result = super(ScriptObject, self).get_namespace_names()
+		for field_name in ["classname", "superclass"]:
+			namespace_name = get_string(self.field_values.get(field_name, ""))
+			if namespace_name != "":
+				result.append(namespace_name)
+		return result
\ No newline at end of file
@@ -1,22 +1,57 @@
-class SimObject(object):
-	identifier = None
+import inspect
+
+from interpreter.value import EMPTY_STRING, from_python, get_number, get_string
+
+class SimObjectType(type):
 	"""
-		The identifier of this sim object.
+		The metaclass of all sim object classes. The fields and functions of each class, including those inherited, are
+		gathered once when the class is declared so that instances don't have to look for them. Classes that don't
+		declare __slots__ are given empty ones, so instances keep all of their state in the slots of SimObject.
 	"""
 	
-	virtual_machine = None
+	def __new__(metaclass, name, bases, namespace):
+		namespace.setdefault("__slots__", ())
+		return super(SimObjectType, metaclass).__new__(metaclass, name, bases, namespace)
+		
+	def __init__(cls, name, bases, namespace):
+		super(SimObjectType, cls).__init__(name, bases, namespace)
+		
+		cls.fields = {}
+		cls.functions = {}
+		# Walk from the root down so that subclasses override what they inherit
+		for current_class in reversed(cls.__mro__):
+			for member_name, member in current_class.__dict__.items():
+				if type(member) is cls.Field:
+					member.name = member_name
+					cls.fields[member_name.lower()] = member
+				elif type(member) is cls.Function:
+					cls.functions[member_name.lower()] = member
+					
+class SimObject(object):
 	"""
-		The virtual machine instance we are associated with.
+		The base of all objects scripts can create.
+		
+		identifier: The identifier of this sim object.
+		name: The name of this sim object, or None if it has none.
+		sets: A list of the sim sets holding this object, or None if it has never been added to one.
+		namespace: The namespace this object dispatches methods through.
+		virtual_machine: The virtual machine instance we are associated with.
+		attributes: Script defined attributes.
+		field_values: A dictionary mapping field names to their values on this instance.
 	"""
+	__metaclass__ = SimObjectType
+	__slots__ = ["identifier", "name", "sets", "namespace", "virtual_machine", "attributes", "field_values"]
 	
-	attributes = None
+	fields = None
 	"""
-		Script defined attributes.
+		A dictionary mapping lowercase field names to the fields of this class and the classes it inherits from. This
+		is shared by all instances of the class.
 	"""
 	
-	fields = None
+	functions = None
 	"""
-		Class specific fields.
+		A dictionary mapping lowercase function names to the functions of this class and the classes it inherits from.
+		This is shared by all instances of the class.
 	"""
 	
 	class Field(object):
@@ -25,19 +60,22 @@ class SimObject(object):
 			The internal python object referenced by this field.
 		"""
 		
-		internal_value = None
+		name = None
 		"""
-			The internally stored value.
+			The attribute name of this field, set when its class is declared.
 		"""
 		
 		def __init__(self, callable):
 			self.internal_callable = callable
 			
 		def __set__(self, instance, value):
-			self.internal_value = self.internal_callable(instance, value)
+			# Values live on the instance, the field itself is shared by every instance of the class
+			instance.field_values[self.name] = self.internal_callable(instance, value)
 			
 		def __get__(self, instance, owner):
-			return self.internal_value
+			if instance is None:
+				return self
+			return instance.field_values.get(self.name, "")
 			
 	class Function(object):
 		internal_callable = None
@@ -45,40 +83,117 @@ class SimObject(object):
 			The internal python object referenced by this field.
 		"""
 		
+		minimum_arguments = None
+		"""
+			The fewest arguments the function accepts, not counting the object it is called on.
+		"""
+		
+		maximum_arguments = None
+		"""
+			The most arguments the function accepts, not counting the object it is called on, or None if there is no limit.
+		"""
+		
 		def __init__(self, callable):
 			self.internal_callable = callable
+			
+			argument_names, variable_arguments, keywords, defaults = inspect.getargspec(callable)
+			self.minimum_arguments = len(argument_names) - len(defaults or ()) - 1
+			self.maximum_arguments = len(argument_names) - 1 if variable_arguments is None else None
 		
 		def __get__(self, instance, owner):
 			return self.internal_callable
 			
+		def call(self, vm, arguments):
+			"""
+				Calls this function as a method. The first argument is the object it is called on.
+				
+				:param vm: The interpreter instance to execute within the context of.
+				:param arguments: The list of arguments passed by the script.
+				:rtype: object
+				:return: The result, or an empty string if there is none.
+			"""
+			sim_object = vm.get_object(arguments[0])
+			if sim_object is None:
+				return EMPTY_STRING
+			elif len(arguments) - 1 < self.minimum_arguments or (self.maximum_arguments is not None and len(arguments) - 1 > self.maximum_arguments):
+				if self.maximum_arguments is None:
+					print("%s: Expected at least %u arguments, got %u." % (self.internal_callable.__name__, self.minimum_arguments, len(arguments) - 1))
+				else:
+					print("%s: Expected %u to %u arguments, got %u." % (self.internal_callable.__name__, self.minimum_arguments, self.maximum_arguments, len(arguments) - 1))
+				return EMPTY_STRING
+				
+			result = self.internal_callable(sim_object, *arguments[1:])
+			if result is None:
+				return EMPTY_STRING
+			return from_python(result)
+			
 	@Function
 	def delete(self, *params):
 		"""
-			Deletes this object from the interpreter.
+			Deletes this object from the interpreter, taking it out of every set holding it.
 		"""
-			
-	def __init__(self, vm):
+		for sim_set in list(self.sets or ()):
+			sim_set.remove_member(self)
+		self.virtual_machine.remove_object(self)
+		
+	@Function
+	def schedule(self, delay, function_name, *arguments):
+		"""
+			Calls a method of this object after a delay in milliseconds and returns the identifier of the event. The call
+			is cancelled if this object is deleted first.
+		"""
+		return self.virtual_machine.schedule(get_number(delay), get_string(function_name), arguments, self, is_method=True)
+		
+	def __init__(self, vm, name=None):
 		self.attributes = {}
+		self.field_values = {}
 		self.virtual_machine = vm
-		self.identifier = vm.get_next_identifier()
-		self.fields = {field_name: field for field_name, field in zip(self.__class__.__dict__.keys(), self.__class__.__dict__.values()) if type(field) is SimObject.Field}
-		self.functions = {function_name: function for function_name, function in zip(self.__class__.__dict__.keys(), self.__class__.__dict__.values()) if type(function) is SimObject.Function}
+		self.identifier = None
+		self.name = None
+		self.sets = None
+		self.namespace = None
+		vm.add_object(self, name)
+		vm.link_namespace(self)
 		
 	def get_member(self, member_name):
+		# Members are case insensitive
+		member_name = self.virtual_machine.get_lowercase(member_name)
 		if member_name in self.fields:
-			return getattr(self, member_name)
+			return getattr(self, self.fields[member_name].name)
 		elif member_name in self.attributes:
 			return self.attributes[member_name]
 		return ""
 		
 	def set_member(self, member_name, value):
+		member_name = self.virtual_machine.get_lowercase(member_name)
 		if member_name in self.fields:
-			setattr(self, member_name, value)
-		elif member_name in self.attributes:
+			setattr(self, self.fields[member_name].name, value)
+		else:
 			self.attributes[member_name] = value
 		
-	def call(self, function_name):
-		self.virtual_machine.call(function_name, target=self)
+	def call(self, function_name, *arguments):
+		"""
+			Calls a method of this object, resolved through its namespace.
+			
+			:param function_name: The name of the method.
+			:param arguments: The arguments to pass after the object itself.
+			:rtype: object
+			:return: The value returned by the method.
+		"""
+		self.virtual_machine.stack.extend([from_python(argument) for argument in arguments])
+		return self.virtual_machine.call(function_name, len(arguments), target=self)
+		
+	def get_namespace_names(self):
+		"""
+			Gets the names of the script namespaces this object dispatches methods through before the namespace of its
+			class.
+			
+			:rtype: list
+			:return: The namespace names, searched first to last.
+		"""
+		if self.name is not None:
+			return [self.name]
+		return []
 		
 	@staticmethod
 	def get_children_classes(object_type_list=None):
@@ -90,25 +205,16 @@ class SimObject(object):
 			
 			:param object_type_list: The current type list we are processing.
 		"""
-		result = object_type_list
+		result = list(object_type_list)
 		for object_type in object_type_list:
-			sub_object_types = object_type.__subclasses__()
-			result += sub_object_types + recurse_object_types(sub_object_types)
+			result += SimObject.get_children_classes(object_type.__subclasses__())
 		return result
 
 	def get_hierarchy(self):
-		def recurse_parents(object_type_list=None):
-			if object_type_list is None:
-				object_type_list = SimObject.__subclasses__()
-				
-			"""
-				Helper function to recurse the class hierarchy from SimObject downwards.
-				
-				:param object_type_list: The current type list we are processing.
-			"""
-			result = object_type_list
-			for object_type in object_type_list:
-				sub_object_types = object_type.__bases__()
-				result += sub_object_types + recurse_object_types(sub_object_types)
-			return result 
-		return recurse_parents(self.__class__.__bases__())
\ No newline at end of file
+		"""
+			Gets the sim object classes this object is an instance of.
+			
+			:rtype: list
+			:return: The classes, starting with the class of this object and ending with SimObject.
+		"""
+		return [current_class for current_class in self.__class__.__mro__ if issubclass(current_class, SimObject)]
@@ -0,0 +1,238 @@
+from simobject import SimObject
+from interpreter.builtins import convert_value
+
+class SimSet(SimObject):
+	"""
+		An ordered set of sim objects. Members are kept in a list so they can be read by index without copying, with a
+		dictionary of their positions so adding, removing and membership tests don't have to search. Removed members
+		leave a hole. Holes are closed up once they outnumber members, or on a read by index once they make up an eighth
+		of the list, so every closing up is paid for by that many removals. Until then reads by index skip over holes
+		using a binary indexed tree counting the members up to each position.
+		
+		members: The list of members, with None in place of removed members.
+		member_indexes: A dictionary mapping each member to its position in members.
+		hole_count: The number of removed members still taking up space in members.
+		member_counts: The binary indexed tree over members, or None until it is needed. Entry i holds the number of
+		members in the positions (i - (i & -i), i], counting from one.
+	"""
+	__slots__ = ["members", "member_indexes", "hole_count", "member_counts"]
+	
+	def __init__(self, vm, name=None):
+		super(SimSet, self).__init__(vm, name)
+		self.members = []
+		self.member_indexes = {}
+		self.hole_count = 0
+		self.member_counts = None
+		
+	def add_member(self, sim_object):
+		"""
+			Adds an object to the end of this set. Objects already in the set are left where they are.
+			
+			:param sim_object: The object to add.
+		"""
+		if sim_object in self.member_indexes:
+			return
+			
+		self.member_indexes[sim_object] = len(self.members)
+		self.members.append(sim_object)
+		if self.member_counts is not None:
+			# The new entry covers itself and the positions before it that no earlier entry reaching it covers
+			tree_index = len(self.members)
+			self.member_counts.append(1 + self.count_members(tree_index - 1) - self.count_members(tree_index - (tree_index & -tree_index)))
+		if sim_object.sets is None:
+			sim_object.sets = []
+		sim_object.sets.append(self)
+		
+	def remove_member(self, sim_object):
+		"""
+			Removes an object from this set, keeping the order of the remaining members.
+			
+			:param sim_object: The object to remove.
+		"""
+		member_index = self.member_indexes.pop(sim_object, None)
+		if member_index is None:
+			return
+			
+		self.members[member_index] = None
+		self.hole_count += 1
+		sim_object.sets.remove(self)
+		
+		# Closing up costs the length of the list, so only do it once that many members have been removed
+		if self.hole_count > len(self.member_indexes):
+			self.compact()
+		elif self.member_counts is not None:
+			tree_index = member_index + 1
+			while tree_index < len(self.member_counts):
+				self.member_counts[tree_index] -= 1
+				tree_index += tree_index & -tree_index
+				
+	def count_members(self, position_count):
+		"""
+			Counts the members in the first positions of members, using the binary indexed tree.
+			
+			:param position_count: The number of positions to count the members in.
+			:rtype: int
+			:return: The number of members.
+		"""
+		result = 0
+		while position_count > 0:
+			result += self.member_counts[position_count]
+			position_count -= position_count & -position_count
+		return result
+		
+	def build_member_counts(self):
+		"""
+			Builds the binary indexed tree over members.
+		"""
+		self.member_counts = [0] * (len(self.members) + 1)
+		for tree_index in range(1, len(self.members) + 1):
+			if self.members[tree_index - 1] is not None:
+				self.member_counts[tree_index] += 1
+			parent_index = tree_index + (tree_index & -tree_index)
+			if parent_index <= len(self.members):
+				self.member_counts[parent_index] += self.member_counts[tree_index]
+				
+	def is_member(self, sim_object):
+		return sim_object in self.member_indexes
+		
+	def get_count(self):
+		return len(self.member_indexes)
+		
+	def get_object_at(self, member_index):
+		"""
+			Gets a member by its position in this set.
+			
+			:param member_index: The position of the member.
+			:rtype: SimObject
+			:return: The member, or None if the position is out of range.
+		"""
+		if member_index < 0 or member_index >= len(self.member_indexes):
+			return None
+		elif self.hole_count != 0 and self.hole_count * 8 >= len(self.members):
+			self.compact()
+			
+		if self.hole_count == 0:
+			return self.members[member_index]
+		elif self.member_counts is None:
+			self.build_member_counts()
+			
+		# Walk down the tree to the last position with no more than member_index members up to it
+		position = 0
+		remaining = member_index + 1
+		step = 1 << (len(self.members).bit_length() - 1)
+		while step != 0:
+			if position + step <= len(self.members) and self.member_counts[position + step] < remaining:
+				position += step
+				remaining -= self.member_counts[position]
+			step >>= 1
+		return self.members[position]
+		
+	def get_objects(self):
+		"""
+			Gets the members of this set in order. The list may belong to the set and must not be changed.
+			
+			:rtype: list
+			:return: The members.
+		"""
+		if self.hole_count != 0 and self.hole_count * 8 >= len(self.members):
+			self.compact()
+		elif self.hole_count != 0:
+			return [member for member in self.members if member is not None]
+		return self.members
+		
+	def compact(self):
+		"""
+			Closes up the holes left by removed members.
+		"""
+		self.members = [member for member in self.members if member is not None]
+		self.member_indexes = {member: member_index for member_index, member in enumerate(self.members)}
+		self.hole_count = 0
+		self.member_counts = None
+		
+	@SimObject.Function
+	def add(self, *params):
+		"""
+			Adds each of the given objects to this set.
+		"""
+		for param in params:
+			sim_object = self.virtual_machine.get_object(param)
+			if sim_object is not None:
+				self.add_member(sim_object)
+				
+	@SimObject.Function
+	def remove(self, *params):
+		"""
+			Removes each of the given objects from this set.
+		"""
+		for param in params:
+			sim_object = self.virtual_machine.get_object(param)
+			if sim_object is not None:
+				self.remove_member(sim_object)
+				
+	@SimObject.Function
+	def clear(self, *params):
+		"""
+			Removes every object from this set.
+		"""
+		for sim_object in list(self.get_objects()):
+			self.remove_member(sim_object)
+			
+	@SimObject.Function
+	def isMember(self, sim_object):
+		"""
+			Returns 1 if the given object is in this set, 0 otherwise.
+		"""
+		sim_object = self.virtual_machine.get_object(sim_object)
+		return 1 if sim_object is not None and self.is_member(sim_object) else 0
+		
+	@SimObject.Function
+	def getCount(self, *params):
+		"""
+			Returns the number of objects in this set.
+		"""
+		return self.get_count()
+		
+	@SimObject.Function
+	def getObject(self, member_index):
+		"""
+			Returns the object at the given position in this set, or -1 if there is none.
+		"""
+		sim_object = self.get_object_at(convert_value(member_index, int))
+		return sim_object.identifier if sim_object is not None else -1
+		
+	@SimObject.Function
+	def delete(self, *params):
+		"""
+			Deletes this set. Its members are taken out of it first, so that they don't hold on to it.
+		"""
+		for sim_object in self.member_indexes:
+			sim_object.sets.remove(self)
+		self.members = []
+		self.member_indexes = {}
+		self.hole_count = 0
+		self.member_counts = None
+		SimObject.delete(self)
+		
+class SimGroup(SimSet):
+	"""
+		A set that owns its members. An object belongs to at most one group, so adding it to a group takes it out of
+		its previous one, and deleting a group deletes everything in it.
+	"""
+	
+	def add_member(self, sim_object):
+		if sim_object in self.member_indexes:
+			return
+			
+		for sim_set in list(sim_object.sets or ()):
+			if isinstance(sim_set, SimGroup):
+				sim_set.remove_member(sim_object)
+		super(SimGroup, self).add_member(sim_object)
+		
+	@SimObject.Function
+	def delete(self, *params):
+		"""
+			Deletes this group along with every object in it.
+		"""
+		for sim_object in list(self.get_objects()):
+			sim_object.__class__.delete(sim_object)
+		SimSet.delete(self)
@@ -1,6 +1,7 @@
+import io
 import struct
 
-from dsodecoder import DSODecoder
+from dsodecoder import DSODecoder, DecoderError, map_file
 
 class CodeBlock(DSODecoder):
 	"""
@@ -16,6 +17,11 @@ class CodeBlock(DSODecoder):
 			A list of opcodes to execute for this function.
 		"""
 		
+		decoded_code = None
+		"""
+			The pre-decoded form of code, built on the first call.
+		"""
+		
 		def __init__(self, code):
 			self.code = code
 			
@@ -26,8 +32,9 @@ class CodeBlock(DSODecoder):
 				:param vm: The intepreter instance to execute within the context of.
 				:param code_block: The code block to execute within the context of.
 			"""
-			for opcode in self.code:
-				opcode.execute(vm, code_block)
+			if self.decoded_code is None:
+				self.decoded_code = code_block.decode_code(self.code)
+			vm.execute(self.decoded_code)
 			
 	class DataBlock(object):
 		attributes = None
@@ -49,9 +56,11 @@ class CodeBlock(DSODecoder):
 	"""
 		
 	def load(self, byte_data):
-		# Initialize from a file handle
+		# Initialize from a file handle, mapping it rather than reading it in
 		if type(byte_data) is file:
-			byte_data = byte_data.read()
+			byte_data = map_file(byte_data)
+		self.byte_data = byte_data
+		self.byte_index = 0
 		
 		version_handlers = self.get_versions()
 		version_identifier = self.read_fixed_bytes(int)
@@ -63,7 +72,33 @@ class CodeBlock(DSODecoder):
 		self.load(byte_data)
 	
 	def get_versions(self):
-		return {codeblock_handler.VERSION_IDENTIFIER: codeblock_handler for codeblock_handler in CodeBlock.__subclasses__()}
+		# Newer versions may build on older ones, so look through the whole class hierarchy
+		result = {}
+		codeblock_handlers = CodeBlock.__subclasses__()
+		while len(codeblock_handlers) != 0:
+			codeblock_handler = codeblock_handlers.pop()
+			result[codeblock_handler.VERSION_IDENTIFIER] = codeblock_handler
+			codeblock_handlers += codeblock_handler.__subclasses__()
+		return result
+		
+	def get_function_names(self):
+		"""
+			Gets the names of all functions declared by this codeblock without decoding them.
+			
+			:rtype: list
+			:return: A list of lowercase function names.
+		"""
+		return list(self.function_table.keys())
+		
+	def get_function(self, function_name):
+		"""
+			Gets the opcodes of a function declared by this codeblock, decoding them if necessary.
+			
+			:param function_name: The lowercase name of the function.
+			:rtype: list
+			:return: A list of opcodes.
+		"""
+		return self.function_table[function_name]
 		
 	def call(self, vm):
 		"""
@@ -71,8 +106,17 @@ class CodeBlock(DSODecoder):
 			
 			:param vm: The interpreter instance to execute in the context of.
 		"""
-		for opcode in self.global_code:
-			opcode.execute(vm, self)
+		vm.execute(self.decode_code(self.global_code))
+		
+	def decode_code(self, code):
+		"""
+			Pre-decodes a list of opcodes from this codeblock into the flat form run by the interpreter dispatch loop.
+			
+			:param code: The list of opcodes to decode.
+			:rtype: list
+			:return: A list of (handler, operand) tuples.
+		"""
+		return [current_opcode.decode(self) for current_opcode in code]
 			
 	def __init__(self, byte_data=None):
 		super(CodeBlock, self).__init__(byte_data)
@@ -82,5 +126,27 @@ class CodeBlock(DSODecoder):
 		if byte_data is not None:
 			self.load(byte_data)
 			
-	def generate_bytes(self):
-		return struct.pack("<I", self.VERSION_IDENTIFIER)
\ No newline at end of file
+	def generate_bytes(self, writer=None):
+		"""
+			Serializes this codeblock.
+			
+			:param writer: A file like object to stream the bytecode to. If this is None, the bytecode is returned instead.
+			:rtype: str
+			:return: The bytecode, or None if it was written to writer.
+		"""
+		if writer is not None:
+			self.write_bytes(writer)
+			return None
+			
+		writer = io.BytesIO()
+		self.write_bytes(writer)
+		return writer.getvalue()
+		
+	def write_bytes(self, writer):
+		"""
+			Writes the bytecode of this codeblock to a file like object. Version handlers extend this to write their body
+			after the version identifier.
+			
+			:param writer: The file like object to write to.
+		"""
+		writer.write(struct.pack("<I", self.VERSION_IDENTIFIER))
\ No newline at end of file
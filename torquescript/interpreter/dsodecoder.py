@@ -1,9 +1,29 @@
+import mmap
 import struct
 
-import tsopcode
+import opcode
+
+UINT32 = struct.Struct("<I")
+"""
+	The layout of opcode identifiers and other 4 byte fields, compiled once rather than on every read.
+"""
 
 class DecoderError(StandardError):
 	pass
+	
+def map_file(handle):
+	"""
+		Maps an open file into memory so that it can be decoded in place. Files that cannot be mapped, such as empty files
+		or pipes, are read in whole instead.
+		
+		:param handle: The open file to map.
+		:rtype: mmap.mmap or str
+		:return: A read only mapping of the file, or its contents if it could not be mapped.
+	"""
+	try:
+		return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+	except (ValueError, EnvironmentError):
+		return handle.read()
 				
 class DSODecoder(object):
 	instructions = None
@@ -13,7 +33,7 @@ class DSODecoder(object):
 	
 	byte_data = None
 	"""
-		The raw byte data we are processing.
+		The raw byte data we are processing. This is a string or an mmap, and is only ever read in place.
 	"""
 	
 	byte_index = None
@@ -44,17 +64,17 @@ class DSODecoder(object):
 			:rtype: dict
 			:return: A dictionary mapping opcode identifiers to opcode metadata.
 		"""
-		return {opcode.IDENTIFIER: opcode for opcode in tsopcode.OpCode.__subclasses__()}
+		return {opcode.IDENTIFIER: opcode for opcode in opcode.OpCode.__subclasses__()}
 		
 	def read_fixed_bytes(self, type, advance=True, length=None):
 		if self.byte_index >= len(self.byte_data):
 			raise DecoderError("Attempted out of bounds read!")
 			
 		if type is int:
-			result = struct.unpack_from("<I", self.byte_data, self.byte_index)[0]
+			result = UINT32.unpack_from(self.byte_data, self.byte_index)[0]
 			
 			if advance is True:
-				self.byte_index += 4			
+				self.byte_index += UINT32.size
 			return result
 		else:
 			raise DecoderError("Unknown fixed-length data type: %s" % type.__name__) 
@@ -76,17 +96,17 @@ class DSODecoder(object):
 		if self.byte_index >= len(self.byte_data):
 			raise DecoderError("Attempted out of bounds read!")
 			
-		current_identifier = struct.unpack_from("<I", self.byte_data, self.byte_index)[0]
+		current_identifier = UINT32.unpack_from(self.byte_data, self.byte_index)[0]
 		
 		# If this does not correspond to an opcode, we probably encountered in a format byte.
-		if current_identifier not in self.opcode_table:
+		opcode_type = self.opcode_table.get(current_identifier)
+		if opcode_type is None:
 			return None
 						
-		generated_opcode = self.opcode_table[current_identifier]()
+		generated_opcode = opcode_type()
 		
 		# Advance the byte counter
-		# FIXME: Magic number 4, opcode length
-		self.byte_index += generated_opcode.read_parameters(self.byte_data, self.byte_index + 4) + 4
+		self.byte_index += generated_opcode.read_parameters(self.byte_data, self.byte_index + UINT32.size) + UINT32.size
 		return generated_opcode
 		
 	def generate_bytes(self):
@@ -2,11 +2,17 @@
 	Torque Script interpreter implementation.
 """
 
+import math
+import heapq
 import struct
-import inspect
 
 import builtins
-import tsopcode
+import vectormath
+from value import EMPTY_STRING, StringValue, get_number, get_string
+from namespace import Namespace
+from scheduler import ScheduledEvent
+from classes import SimObject
+from v1.opcodes import PushString, Pop, Add, Subtract, SetGlobal, GetGlobal
 
 class InterpreterError(StandardError):
 	pass
@@ -14,56 +20,861 @@ class InterpreterError(StandardError):
 class InterpreterError(StandardError):
 	pass
 	
+class FunctionReturn(Exception):
+	"""
+		Raised by return_from_frame to unwind the dispatch loop of the function being returned from.
+	"""
+	
+class Frame(object):
+	"""
+		A record of an active function call. Frames are allocated once per interpreter and reused, so calls don't
+		allocate.
+		
+		base_pointer: The index in the value stack of the first argument.
+		argument_count: The number of arguments passed.
+		return_value: The return slot, holding the value handed back to the caller.
+		definition: The FunctionDefinition being run, or None for global code.
+	"""
+	__slots__ = ["base_pointer", "argument_count", "return_value", "definition"]
+	
+	def __init__(self):
+		self.base_pointer = 0
+		self.argument_count = 0
+		self.return_value = EMPTY_STRING
+		self.definition = None
+		
+class FunctionDefinition(object):
+	"""
+		A single definition of a script function. A function can have several at once, the one outside of any package
+		and one for each active package overriding it, which stack up in activation order.
+		
+		name: The lowercase name of the function.
+		code_block: The code block declaring it.
+		package_name: The lowercase name of the package declaring it, or None.
+		function_code: The pre-decoded code, or None if it has not been called yet.
+		parent: The definition Parent:: calls from this one reach, or None if they reach the built in of the same name.
+	"""
+	__slots__ = ["name", "code_block", "package_name", "function_code", "parent"]
+	
+	def __init__(self, name, code_block, package_name=None):
+		self.name = name
+		self.code_block = code_block
+		self.package_name = package_name
+		self.function_code = None
+		self.parent = None
+	
 class Interpreter(object):
-	current_identifier_counter = None
+	MAXIMUM_CALL_DEPTH = 256
+	"""
+		The deepest calls may nest before the interpreter reports a stack overflow. Each call also recurses in Python, so
+		this must stay well below the recursion limit.
+	"""
 	
 	global_functions = None
+	"""
+		A dictionary mapping lowercase function names to their active FunctionDefinition.
+	"""
+	
+	function_stacks = None
+	"""
+		A dictionary mapping lowercase function names to their definitions, the one outside of any package first
+		followed by those of active packages in activation order. The last definition is the active one.
+	"""
+	
+	packages = None
+	"""
+		A dictionary mapping lowercase package names to a dictionary mapping the names of the functions they declare to
+		their FunctionDefinition.
+	"""
+	
+	active_packages = None
+	"""
+		A list of the lowercase names of active packages, in activation order.
+	"""
+	
+	global_variables = None
+	"""
+		A dictionary mapping lowercase global variable names to their values.
+	"""
 	
 	stack = None
 	"""
-		The current virtual machine stack.
+		The value stack, shared by every frame. It holds values as described in the value module. Arguments are passed in
+		place on it. The dispatch loop holds on to it, so it is only ever changed in place.
 	"""
 	
-	code_blocks = None
+	frames = None
+	"""
+		The preallocated frame records. The first frame belongs to global code.
+	"""
+	
+	frame_depth = None
+	"""
+		The number of frames in use.
+	"""
 	
 	builtin_functions = None
+	"""
+		A dictionary mapping lowercase built in names to their builtins.Builtin.
+	"""
+	
+	string_pool = None
+	"""
+		A dictionary mapping every string used by the registered code blocks to its one shared instance. Code blocks are
+		remapped onto the pool when registered, so the same string is only stored once however many blocks use it, and
+		name lookups on pooled strings compare by identity.
+	"""
+	
+	lowercase_strings = None
+	"""
+		A dictionary mapping pooled strings to their pooled lowercase form, so names are not lowered again on every lookup.
+	"""
+	
+	function_generation = None
+	"""
+		A counter bumped whenever functions are defined. Call sites cache what a function name resolved to along with
+		the generation it was resolved in, so bumping this invalidates all of them.
+	"""
+	
+	objects = None
+	"""
+		A list of the live sim objects, indexed by their identifier. Slots of deleted objects hold None until their
+		identifier is reused. Identifier 0 is never handed out, as it means no object to scripts.
+	"""
+	
+	object_names = None
+	"""
+		A dictionary mapping lowercase object names to the live sim object with that name.
+	"""
+	
+	free_identifiers = None
+	"""
+		A list of the identifiers of deleted objects, handed out again before any new identifier.
+	"""
+	
+	namespaces = None
+	"""
+		A dictionary mapping lowercase namespace names to their namespace.Namespace.
+	"""
+	
+	class_namespaces = None
+	"""
+		A dictionary mapping sim object classes to the namespace of their native methods.
+	"""
+	
+	current_time = None
+	"""
+		The simulation time in milliseconds. This only advances through process_until. While an event runs it is the
+		time the event was due at.
+	"""
+	
+	scheduled_events = None
+	"""
+		A dictionary mapping the identifiers of pending events to their scheduler.ScheduledEvent.
+	"""
+	
+	event_heap = None
+	"""
+		A heap of (time, identifier) tuples for the scheduled events. Cancelled events are left in place and skipped when
+		they come up, so cancelling never has to search the heap.
+	"""
+	
+	object_events = None
+	"""
+		A dictionary mapping sim object identifiers to a set of the identifiers of pending events to cancel when the
+		object is deleted.
+	"""
+	
+	next_event_identifier = None
+	"""
+		The identifier handed to the next scheduled event.
+	"""
 
 	def __init__(self):
 		self.stack = []
-		self.code_blocks = {}
+		self.frames = [Frame() for frame_index in range(self.MAXIMUM_CALL_DEPTH + 1)]
+		self.frame_depth = 1
 		self.global_functions = {}
-		self.current_identifier_counter = 0
-		self.builtin_functions = {current_member[1].__name__: current_member[1] for current_member in inspect.getmembers(builtins, inspect.isfunction)}
+		self.function_stacks = {}
+		self.packages = {}
+		self.active_packages = []
+		self.global_variables = {}
+		self.string_pool = {}
+		self.lowercase_strings = {}
+		self.function_generation = 0
+		self.objects = [None]
+		self.object_names = {}
+		self.free_identifiers = []
+		self.namespaces = {}
+		self.class_namespaces = {}
+		self.current_time = 0
+		self.scheduled_events = {}
+		self.event_heap = []
+		self.object_events = {}
+		self.next_event_identifier = 1
+		self.builtin_functions = {self.intern_string(builtin_name): builtin for builtin_name, builtin in builtins.BUILTIN_FUNCTIONS.items()}
+		
+		self.object_types = {self.intern_string(object_type.__name__.lower()): object_type for object_type in [SimObject] + SimObject.get_children_classes()}
+		
+	def intern_string(self, string):
+		"""
+			Gets the pooled instance of a string, adding it to the pool if it is not there yet.
+			
+			:param string: The string to look up.
+			:rtype: str
+			:return: The pooled instance, equal to string.
+		"""
+		result = self.string_pool.get(string)
+		if result is None:
+			result = self.string_pool[string] = string
+			lowercase = self.string_pool.setdefault(string.lower(), string.lower())
+			self.lowercase_strings[result] = lowercase
+			self.lowercase_strings.setdefault(lowercase, lowercase)
+		return result
+		
+	def get_lowercase(self, name):
+		"""
+			Gets the lowercase form of a name, used by every case insensitive lookup. Pooled names only take a single
+			dictionary lookup, names built at runtime are lowered as usual.
+			
+			:param name: The name to lower.
+			:rtype: str
+			:return: The lowercase form of the name.
+		"""
+		result = self.lowercase_strings.get(name)
+		if result is None:
+			return name.lower()
+		return result
+		
+	def add_object(self, sim_object, name=None):
+		"""
+			Registers a new sim object, giving it an identifier.
+			
+			:param sim_object: The sim object to register.
+			:param name: The name of the object, or None if it has none.
+		"""
+		if len(self.free_identifiers) != 0:
+			sim_object.identifier = self.free_identifiers.pop()
+			self.objects[sim_object.identifier] = sim_object
+		else:
+			sim_object.identifier = len(self.objects)
+			self.objects.append(sim_object)
+			
+		if name:
+			self.set_object_name(sim_object, name)
 		
-		self.object_types = {object_type.__name__.lower(): object_type for object_type in SimObject.get_children_classes()}
+	def remove_object(self, sim_object):
+		"""
+			Unregisters a sim object, freeing its identifier and name. Objects that are not registered are ignored.
+			
+			:param sim_object: The sim object to unregister.
+		"""
+		if not self.is_registered(sim_object):
+			return
+			
+		# Events are only cancelled here, as the identifier may go to a new object
+		for event_identifier in list(self.object_events.get(sim_object.identifier, ())):
+			self.cancel_event(event_identifier)
+		self.set_object_name(sim_object, None)
+		self.objects[sim_object.identifier] = None
+		self.free_identifiers.append(sim_object.identifier)
+		
+	def is_registered(self, sim_object):
+		return sim_object.identifier is not None and sim_object.identifier < len(self.objects) and self.objects[sim_object.identifier] is sim_object
+		
+	def set_object_name(self, sim_object, name):
+		"""
+			Renames a sim object.
+			
+			:param sim_object: The sim object to rename.
+			:param name: The new name, or None or an empty string to remove its name.
+		"""
+		if sim_object.name is not None:
+			lowercase_name = self.get_lowercase(sim_object.name)
+			# Only drop the name if a newer object of the same name hasn't taken it over
+			if self.object_names.get(lowercase_name) is sim_object:
+				del self.object_names[lowercase_name]
+				
+		sim_object.name = name if name else None
+		if sim_object.name is not None:
+			self.object_names[self.get_lowercase(name)] = sim_object
+			
+		# Objects being created are linked once they are set up
+		if sim_object.namespace is not None:
+			self.link_namespace(sim_object)
+			
+	def get_namespace(self, name):
+		"""
+			Gets a script namespace, creating it if it doesn't exist yet.
+			
+			:param name: The name of the namespace.
+			:rtype: namespace.Namespace
+			:return: The namespace.
+		"""
+		name = self.get_lowercase(name)
+		namespace = self.namespaces.get(name)
+		if namespace is None:
+			namespace = self.namespaces[name] = Namespace(name)
+		return namespace
+		
+	def get_class_namespace(self, object_type):
+		"""
+			Gets the namespace of a sim object class, linked to those of the classes it inherits from.
+			
+			:param object_type: The sim object class.
+			:rtype: namespace.Namespace
+			:return: The namespace.
+		"""
+		namespace = self.class_namespaces.get(object_type)
+		if namespace is None:
+			base_types = [base_type for base_type in object_type.__bases__ if issubclass(base_type, SimObject)]
+			namespace = self.get_namespace(object_type.__name__)
+			namespace.native_functions = object_type.functions
+			if len(base_types) != 0:
+				self.set_namespace_parent(namespace, self.get_class_namespace(base_types[0]))
+			self.class_namespaces[object_type] = namespace
+		return namespace
 		
-	def get_next_identifier(self):
-		self.current_identifier_counter += 1
-		return self.current_identifier_counter
+	def set_namespace_parent(self, namespace, parent):
+		"""
+			Links a namespace to the namespace searched after it. Namespaces are shared by every object using them, so
+			like in the engine a namespace that is already linked keeps its parent. The one exception is linking it to a
+			descendant of its parent, which only puts another namespace in between. Fields are set one at a time after
+			objects are created, so this is how setting superclass after classname links Foo -> Bar -> ScriptObject.
+			
+			:param namespace: The namespace to link.
+			:param parent: The new parent.
+			:rtype: bool
+			:return: False if the namespace is already linked elsewhere or the link would make a namespace its own
+			ancestor, in which case nothing is changed.
+		"""
+		if namespace.parent is parent:
+			return True
+		elif namespace.parent is not None and namespace.parent not in parent.get_chain():
+			print("Error: Cannot change namespace parent linkage of '%s' from '%s' to '%s'." % (namespace.name, namespace.parent.name, parent.name))
+			return False
+		elif namespace in parent.get_chain():
+			print("Error: Cannot link namespace '%s' to '%s', it would become its own ancestor." % (namespace.name, parent.name))
+			return False
+			
+		namespace.parent = parent
+		# Resolutions cached through this namespace may now be wrong
+		if namespace.used is True:
+			self.function_generation += 1
+		return True
+		
+	def link_namespace(self, sim_object):
+		"""
+			Works out the namespace a sim object dispatches methods through, linking its name, classname and superclass
+			namespaces in front of the namespace of its class.
+			
+			:param sim_object: The sim object to link.
+		"""
+		namespace = self.get_class_namespace(sim_object.__class__)
+		for namespace_name in reversed(sim_object.get_namespace_names()):
+			child = self.get_namespace(namespace_name)
+			if child is namespace:
+				continue
+				
+			# A namespace linked elsewhere is still usable as long as it leads back to where this object was headed
+			if self.set_namespace_parent(child, namespace) or namespace in child.get_chain():
+				namespace = child
+		sim_object.namespace = namespace
+		
+	def get_object(self, value):
+		"""
+			Finds the live sim object a script value refers to. Objects are referred to by themselves, by identifier or
+			by name.
+			
+			:param value: The value to look up.
+			:rtype: SimObject
+			:return: The sim object, or None if there is no such object.
+		"""
+		value_type = type(value)
+		if value_type is StringValue:
+			value = value.string
+		elif value_type is float or value_type is int:
+			# Checking the range first also turns away infinities and NaN, which can't be converted to an integer
+			if not 0 < value < len(self.objects) or value != int(value):
+				return None
+			return self.objects[int(value)]
+		elif isinstance(value, SimObject):
+			return value if self.is_registered(value) else None
+		else:
+			value = get_string(value)
+			
+		# Like the engine, anything starting with a digit is an identifier and anything else is a name
+		if value[:1].isdigit():
+			if not value.isdigit():
+				return None
+			value = int(value)
+			if value < len(self.objects):
+				return self.objects[value]
+			return None
+		return self.object_names.get(self.get_lowercase(value))
+		
+	def intern_string_table(self, string_table):
+		"""
+			Remaps a string table onto the pool in place.
+			
+			:param string_table: The list of strings to remap.
+		"""
+		string_table[:] = [self.intern_string(string_table_entry) for string_table_entry in string_table]
 		
-	def register_codeblock(self, block):
-		# Update the function table
-		for function_name, function_code in zip(block.function_table.keys(), block.function_table.values()):
-			self.global_functions[function_name] = function_code
-			self.code_blocks[function_name] = block
+	def register_codeblock(self, block, intern_strings=True, package_name=None):
+		"""
+			Registers the functions of a code block and runs its global code.
+			
+			:param block: The code block to register.
+			:param intern_strings: Whether or not the string table of the block still has to be remapped onto the pool.
+			:param package_name: The name of the package the functions of the block belong to, or None to define them
+			outside of any package. Functions in packages only take effect while the package is active.
+		"""
+		if intern_strings is True:
+			self.intern_string_table(block.string_table)
+		
+		# Update the function table. Functions are only decoded when they are first called
+		if package_name is not None:
+			package_name = self.get_lowercase(package_name)
+			package = self.packages.setdefault(package_name, {})
+			
+		for function_name in block.get_function_names():
+			function_name = self.intern_string(function_name)
+			definition = FunctionDefinition(function_name, block, package_name)
+			function_stack = self.function_stacks.setdefault(function_name, [])
+			
+			if package_name is None:
+				if len(function_stack) != 0 and function_stack[0].package_name is None:
+					function_stack[0] = definition
+				else:
+					function_stack.insert(0, definition)
+			else:
+				previous_definition = package.get(function_name)
+				package[function_name] = definition
+				if previous_definition in function_stack:
+					function_stack[function_stack.index(previous_definition)] = definition
+				elif package_name in self.active_packages:
+					# New functions of an active package go in at the place of the package in the activation order
+					function_stack.insert(self.get_package_position(function_stack, package_name), definition)
+			self.link_function_stack(function_name)
+		self.function_generation += 1
 			
 		# Execute any global code it has
-		for opcode in block.global_code:
-			opcode.execute(self, block)
-	
-	def call(self, function_name, target=None):
-		# FIXME: Code blocks shouldn't override built ins unless package hooked?
-		if function_name not in self.global_functions:
-			# Look for a built in by this name
-			if function_name not in self.builtin_functions:
-				print("Warning: Attempted to call non-existent function '%s'" % function_name)
-				return [""]
-			self.builtin_functions[function_name](self)	
+		try:
+			self.execute(block.decode_code(block.global_code))
+		except FunctionReturn:
+			pass
+			
+	def register_bundle(self, bundle, package_name=None):
+		"""
+			Registers every code block of a bundle, in the order they were packed.
+			
+			:param bundle: The bundle to register.
+			:param package_name: The name of the package the functions of the bundle belong to, or None.
+		"""
+		# The code blocks all share the string table of the bundle, so it only has to be remapped once
+		self.intern_string_table(bundle.string_table)
+		for block in bundle.code_blocks.values():
+			self.register_codeblock(block, intern_strings=False, package_name=package_name)
+			
+	def link_function_stack(self, function_name):
+		"""
+			Points each definition of a function at the one beneath it and makes the top one active. This only touches
+			the definitions of the one function.
+			
+			:param function_name: The lowercase name of the function.
+		"""
+		function_stack = self.function_stacks[function_name]
+		parent = None
+		for definition in function_stack:
+			definition.parent = parent
+			parent = definition
+			
+		if parent is None:
+			self.global_functions.pop(function_name, None)
 		else:
-			function_block = self.global_functions[function_name]
-			for opcode in function_block:
-				opcode.execute(self, self.code_blocks[function_name])
+			self.global_functions[function_name] = parent
+			
+	def get_package_position(self, function_stack, package_name):
+		"""
+			Finds where the definition of a function from an active package belongs in its function stack, which is
+			beneath the definitions of every package activated after it.
+			
+			:param function_stack: The function stack of the function.
+			:param package_name: The lowercase name of the active package.
+			:rtype: int
+			:return: The index to insert the definition at.
+		"""
+		package_index = self.active_packages.index(package_name)
+		for stack_index, definition in enumerate(function_stack):
+			if definition.package_name is not None and self.active_packages.index(definition.package_name) > package_index:
+				return stack_index
+		return len(function_stack)
+		
+	def activate_package(self, package_name):
+		"""
+			Activates a package, so its functions override those defined so far. Activating an active package does
+			nothing.
+			
+			:param package_name: The name of the package.
+			:rtype: bool
+			:return: False if there is no such package.
+		"""
+		package_name = self.get_lowercase(package_name)
+		if package_name not in self.packages:
+			return False
+		elif package_name in self.active_packages:
+			return True
+			
+		self.active_packages.append(package_name)
+		for function_name, definition in self.packages[package_name].items():
+			self.function_stacks[function_name].append(definition)
+			self.link_function_stack(function_name)
+		self.function_generation += 1
+		return True
+		
+	def deactivate_package(self, package_name):
+		"""
+			Deactivates a package. Packages activated after it stay active, and Parent:: calls from their functions now
+			skip over it.
+			
+			:param package_name: The name of the package.
+		"""
+		package_name = self.get_lowercase(package_name)
+		if package_name not in self.active_packages:
+			return
+			
+		self.active_packages.remove(package_name)
+		for function_name, definition in self.packages[package_name].items():
+			self.function_stacks[function_name].remove(definition)
+			self.link_function_stack(function_name)
+		self.function_generation += 1
+		
+	def schedule(self, delay, function_name, arguments=(), sim_object=None, is_method=False):
+		"""
+			Schedules a function call.
+			
+			:param delay: The number of milliseconds from the current simulation time to make the call at.
+			:param function_name: The name of the function to call.
+			:param arguments: The arguments to pass, as values described in the value module.
+			:param sim_object: The sim object whose deletion cancels the call, or None.
+			:param is_method: Whether or not to call the function as a method of sim_object.
+			:rtype: int
+			:return: The identifier of the scheduled event.
+		"""
+		# A delay that isn't a number would never come due and hold up every event behind it, atoi in the engine reads it as 0
+		if math.isnan(delay) or math.isinf(delay):
+			delay = 0
+			
+		event = ScheduledEvent(self.next_event_identifier, self.current_time + max(delay, 0), self.get_lowercase(function_name), list(arguments), sim_object, is_method)
+		self.next_event_identifier += 1
+		
+		self.scheduled_events[event.identifier] = event
+		heapq.heappush(self.event_heap, (event.time, event.identifier))
+		if sim_object is not None:
+			self.object_events.setdefault(sim_object.identifier, set()).add(event.identifier)
+		return event.identifier
+		
+	def cancel_event(self, event_identifier):
+		"""
+			Cancels a pending event. Events that already ran or were cancelled are ignored.
+			
+			:param event_identifier: The identifier of the event.
+		"""
+		event = self.scheduled_events.pop(event_identifier, None)
+		if event is None:
+			return
+			
+		if event.sim_object is not None:
+			object_events = self.object_events[event.sim_object.identifier]
+			object_events.discard(event_identifier)
+			if len(object_events) == 0:
+				del self.object_events[event.sim_object.identifier]
 				
-		result = self.stack
-		self.stack = []
-		return result
\ No newline at end of file
+		# Rebuild the heap once cancelled events make up most of it, so it doesn't grow without bound
+		if len(self.event_heap) > 64 and len(self.event_heap) > 2 * len(self.scheduled_events):
+			self.event_heap = [entry for entry in self.event_heap if entry[1] in self.scheduled_events]
+			heapq.heapify(self.event_heap)
+			
+	def get_event(self, event_identifier):
+		"""
+			Looks up a pending event.
+			
+			:param event_identifier: The identifier of the event.
+			:rtype: scheduler.ScheduledEvent
+			:return: The event, or None if it already ran or was cancelled.
+		"""
+		return self.scheduled_events.get(event_identifier)
+		
+	def process_until(self, time):
+		"""
+			Runs every event due up to a simulation time, in the order they are due, and advances the simulation time to
+			it. Events scheduled while processing run in the same pass if they are due by then.
+			
+			:param time: The simulation time in milliseconds to advance to. Moving backwards does nothing.
+			:rtype: int
+			:return: The number of events run.
+		"""
+		processed_count = 0
+		while len(self.event_heap) != 0 and self.event_heap[0][0] <= time:
+			event_time, event_identifier = heapq.heappop(self.event_heap)
+			event = self.scheduled_events.get(event_identifier)
+			if event is None:
+				continue
+				
+			# Take the event out first, so the call sees it as no longer pending
+			self.cancel_event(event_identifier)
+			self.current_time = event_time
+			self.stack.extend(event.arguments)
+			if event.is_method is True:
+				self.call(event.function_name, len(event.arguments), target=event.sim_object)
+			else:
+				self.call(event.function_name, len(event.arguments))
+			processed_count += 1
+			
+		self.current_time = max(self.current_time, time)
+		return processed_count
+		
+	def execute(self, code):
+		"""
+			The dispatch loop. Runs code pre-decoded by CodeBlock.decode_code, handing each handler its operand. The most
+			common opcodes are performed right here rather than through their handlers, which saves a call and the
+			lookups of the stack on each of them. Everything else goes through its handler.
+			
+			:param code: A list of (handler, operand) tuples.
+		"""
+		stack = self.stack
+		push = stack.append
+		pop = stack.pop
+		global_variables = self.global_variables
+		lowercase_strings = self.lowercase_strings
+		push_handler = PushString.handle
+		pop_handler = Pop.handle
+		add_handler = Add.handle
+		subtract_handler = Subtract.handle
+		set_global_handler = SetGlobal.handle
+		get_global_handler = GetGlobal.handle
+		
+		for handler, operand in code:
+			if handler is push_handler:
+				push(operand)
+			elif handler is add_handler or handler is subtract_handler:
+				rhs = pop()
+				lhs = pop()
+				
+				# Results of arithmetic are always floats, so integers are widened rather than converted as strings
+				value_type = type(rhs)
+				if value_type is StringValue and rhs.number is not None:
+					rhs = rhs.number
+				elif value_type is int:
+					rhs += 0.0
+				elif value_type is not float:
+					rhs = get_number(rhs)
+				value_type = type(lhs)
+				if value_type is StringValue and lhs.number is not None:
+					lhs = lhs.number
+				elif value_type is int:
+					lhs += 0.0
+				elif value_type is not float:
+					lhs = get_number(lhs)
+				push(rhs + lhs if handler is add_handler else rhs - lhs)
+			elif handler is pop_handler:
+				pop()
+			elif handler is set_global_handler:
+				value = pop()
+				name = pop()
+				name = name.string if type(name) is StringValue else get_string(name)
+				global_variables[lowercase_strings.get(name) or name.lower()] = value
+			elif handler is get_global_handler:
+				name = pop()
+				name = name.string if type(name) is StringValue else get_string(name)
+				push(global_variables.get(lowercase_strings.get(name) or name.lower(), EMPTY_STRING))
+			else:
+				handler(self, operand)
+	
+	def call(self, function_name, argument_count=0, target=None):
+		"""
+			Calls a function with the arguments on top of the value stack. The arguments are removed once the function
+			returns.
+			
+			:param function_name: The name of the function to call.
+			:param argument_count: The number of arguments on top of the stack.
+			:param target: The sim object to call the function as a method of, or None. It is passed as the first
+			argument.
+			:rtype: object
+			:return: The value returned by the function, or an empty string if it did not return one.
+		"""
+		function_name = self.get_lowercase(function_name)
+		if target is not None:
+			self.stack.insert(len(self.stack) - argument_count, target)
+			return self.call_method(function_name, argument_count + 1)
+			
+		definition, builtin = self.resolve_function(function_name)
+		return self.invoke(function_name, definition, builtin, argument_count)
+		
+	def call_method(self, function_name, argument_count):
+		"""
+			Calls a method with the arguments on top of the value stack. The first argument is the object to call the
+			method of.
+			
+			:param function_name: The lowercase name of the method.
+			:param argument_count: The number of arguments on top of the stack, including the object.
+			:rtype: object
+			:return: The value returned by the method, or an empty string if it did not return one.
+		"""
+		target = self.get_object(self.stack[len(self.stack) - argument_count])
+		if target is None:
+			print("Warning: Attempted to call method '%s' of non-existent object" % function_name)
+			del self.stack[len(self.stack) - argument_count:]
+			return EMPTY_STRING
+			
+		definition, builtin = self.resolve_method(target.namespace, function_name)
+		return self.invoke(function_name, definition, builtin, argument_count)
+		
+	def resolve_method(self, namespace, function_name):
+		"""
+			Looks up what a method name refers to for objects dispatching through a namespace. Results are cached on the
+			namespace until functions are defined or namespaces are relinked.
+			
+			:param namespace: The namespace.Namespace to start from.
+			:param function_name: The lowercase name of the method.
+			:rtype: tuple
+			:return: A tuple of the FunctionDefinition of the script function and the native function, either or both of
+			which is None.
+		"""
+		if namespace.generation != self.function_generation:
+			namespace.methods.clear()
+			namespace.generation = self.function_generation
+			
+		result = namespace.methods.get(function_name)
+		if result is None:
+			result = (None, None)
+			for current_namespace in namespace.get_chain():
+				current_namespace.used = True
+				qualified_name = self.intern_string(current_namespace.name + "::" + function_name)
+				if qualified_name in self.global_functions:
+					result = self.resolve_function(qualified_name)
+					break
+				elif current_namespace.native_functions is not None and function_name in current_namespace.native_functions:
+					result = (None, current_namespace.native_functions[function_name])
+					break
+			namespace.methods[function_name] = result
+		return result
+		
+	def resolve_function(self, function_name):
+		"""
+			Looks up what a function name refers to, decoding the function if this is its first use.
+			
+			:param function_name: The lowercase name of the function.
+			:rtype: tuple
+			:return: A tuple of the FunctionDefinition of the script function and the built in, either or both of which
+			is None.
+		"""
+		if function_name.startswith("parent::"):
+			return self.resolve_parent(function_name[8:])
+			
+		# Script functions replace built ins of the same name like they do in the engine, which can still be reached
+		# through Parent::
+		definition = self.global_functions.get(function_name)
+		if definition is not None:
+			return (self.decode_definition(definition), None)
+		return (None, self.builtin_functions.get(function_name))
+		
+	def resolve_parent(self, function_name):
+		"""
+			Looks up what a Parent:: call from the running function refers to. In a package this is the definition the
+			package overrides, in a namespace method it is the method of the parent namespace.
+			
+			:param function_name: The lowercase name of the function, without Parent::.
+			:rtype: tuple
+			:return: A tuple of the FunctionDefinition of the script function and the built in, either or both of which
+			is None.
+		"""
+		definition = self.frames[self.frame_depth - 1].definition
+		if definition is None or definition.name.rsplit("::", 1)[-1] != function_name:
+			print("Warning: Parent::%s called from outside of %s" % (function_name, function_name))
+			return (None, None)
+			
+		if definition.parent is not None:
+			return (self.decode_definition(definition.parent), None)
+		elif "::" in definition.name:
+			namespace = self.get_namespace(definition.name.rsplit("::", 1)[0]).parent
+			if namespace is None:
+				return (None, None)
+			return self.resolve_method(namespace, function_name)
+		return (None, self.builtin_functions.get(function_name))
+		
+	def decode_definition(self, definition):
+		"""
+			Decodes a function definition if this is its first use.
+			
+			:param definition: The FunctionDefinition.
+			:rtype: FunctionDefinition
+			:return: The definition.
+		"""
+		if definition.function_code is None:
+			definition.function_code = definition.code_block.decode_code(definition.code_block.get_function(definition.name))
+		return definition
+		
+	def invoke(self, function_name, definition, builtin, argument_count):
+		"""
+			Calls a function resolved by resolve_function with the arguments on top of the value stack.
+			
+			:param function_name: The name of the function, for error reporting.
+			:param definition: The decoded FunctionDefinition of the script function, or None.
+			:param builtin: The built in to call if there is no script function, or None.
+			:param argument_count: The number of arguments on top of the stack.
+			:rtype: object
+			:return: The value returned by the function, or an empty string if it did not return one.
+		"""
+		# Built ins never look at the frame, so they are handed their arguments without one
+		if definition is None:
+			argument_start = len(self.stack) - argument_count
+			arguments = self.stack[argument_start:]
+			del self.stack[argument_start:]
+			
+			if builtin is None:
+				print("Warning: Attempted to call non-existent function '%s'" % function_name)
+				return EMPTY_STRING
+			return builtin.call(self, arguments)
+			
+		if self.frame_depth > self.MAXIMUM_CALL_DEPTH:
+			raise InterpreterError("Stack overflow calling function '%s'." % function_name)
+			
+		frame = self.frames[self.frame_depth]
+		frame.base_pointer = len(self.stack) - argument_count
+		frame.argument_count = argument_count
+		frame.return_value = EMPTY_STRING
+		frame.definition = definition
+		
+		self.frame_depth += 1
+		try:
+			self.execute(definition.function_code)
+		except FunctionReturn:
+			pass
+		finally:
+			self.frame_depth -= 1
+			del self.stack[frame.base_pointer:]
+		return frame.return_value
+		
+	def return_from_frame(self):
+		"""
+			Returns from the current function. A value left on the stack above the arguments is placed in the return slot.
+		"""
+		frame = self.frames[self.frame_depth - 1]
+		if len(self.stack) > frame.base_pointer + frame.argument_count:
+			frame.return_value = self.stack.pop()
+		raise FunctionReturn()
+		
+	def get_argument(self, argument_index):
+		"""
+			Reads an argument of the current function.
+			
+			:param argument_index: The index of the argument.
+			:rtype: object
+			:return: The value of the argument, or an empty string if it was not passed.
+		"""
+		frame = self.frames[self.frame_depth - 1]
+		if argument_index >= frame.argument_count:
+			return EMPTY_STRING
+		return self.stack[frame.base_pointer + argument_index]
\ No newline at end of file
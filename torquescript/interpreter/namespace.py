@@ -0,0 +1,45 @@
+"""
+	Namespaces group the methods objects dispatch through, such as Foo::bar. Each namespace links to a parent, so an
+	object resolves a method by walking from its own namespace through those of its name, classname, superclass and
+	native classes in turn.
+"""
+
+class Namespace(object):
+	"""
+		A single namespace.
+		
+		name: The lowercase name of this namespace.
+		parent: The namespace searched after this one, or None.
+		native_functions: A dictionary mapping lowercase function names to the SimObject.Function of the native class
+		this namespace belongs to, or None if it is a script namespace.
+		methods: A dictionary mapping lowercase method names to what they resolved to from this namespace.
+		generation: The function generation of the interpreter when methods was filled in.
+		used: Whether or not a method has been resolved through this namespace, so relinking it has to drop cached
+		resolutions.
+	"""
+	__slots__ = ["name", "parent", "native_functions", "methods", "generation", "used"]
+	
+	def __init__(self, name, parent=None, native_functions=None):
+		self.name = name
+		self.parent = parent
+		self.native_functions = native_functions
+		self.methods = {}
+		self.generation = None
+		self.used = False
+		
+	def get_chain(self):
+		"""
+			Gets the namespaces searched when resolving a method from this one.
+			
+			:rtype: list
+			:return: This namespace followed by its ancestors.
+		"""
+		result = []
+		namespace = self
+		while namespace is not None:
+			result.append(namespace)
+			namespace = namespace.parent
+		return result
+		
+	def __repr__(self):
+		return "<Namespace: %s>" % self.name
@@ -1,5 +1,39 @@
 import struct
 
+BATCH_STRUCTS = {}
+"""
+	A dictionary mapping (opcode type, count) tuples to the struct.Struct packing that many opcodes of the type back to
+	back, so that each layout is only compiled once.
+"""
+
+RUN_STRUCTS = {}
+"""
+	A dictionary mapping flat tuples of the type and count of each run of opcodes to the struct.Struct packing those
+	runs back to back. Code blocks tend to repeat the same short sequences, so these are compiled once here rather than
+	going through the small cache of the struct module, which a large code block would keep flushing.
+"""
+
+MAXIMUM_RUN_STRUCTS = 1024
+"""
+	The most layouts kept in RUN_STRUCTS before it is emptied.
+"""
+
+def get_runs_struct(runs):
+	"""
+		Gets the struct.Struct packing a sequence of opcode runs, built from the layout of each run in BATCH_STRUCTS.
+		
+		:param runs: A flat tuple of the type of each run followed by its count.
+		:rtype: struct.Struct
+		:return: The precompiled layout of the runs.
+	"""
+	runs_struct = RUN_STRUCTS.get(runs)
+	if runs_struct is None:
+		if len(RUN_STRUCTS) >= MAXIMUM_RUN_STRUCTS:
+			RUN_STRUCTS.clear()
+		runs_format = "".join(opcode_type.get_batch_struct(count).format.lstrip("<") for opcode_type, count in zip(runs[::2], runs[1::2]))
+		runs_struct = RUN_STRUCTS[runs] = struct.Struct("<" + runs_format)
+	return runs_struct
+
 class OpCode(object):
 	"""
 		A class representing an opcode. All opcode identifiers are 2 bytes wide with variable length parameters
@@ -12,6 +46,12 @@ class OpCode(object):
 		the instruction identifier.
 	"""
 	
+	PARAMETER_STRUCT = None
+	"""
+		A precompiled struct.Struct describing the parameters of this opcode, or None if it takes none. Opcodes with
+		parameters that don't fit a fixed layout override read_parameters instead.
+	"""
+	
 	parameters = None
 	"""
 		A list of parameters associated with this opcode.
@@ -22,15 +62,65 @@ class OpCode(object):
 	
 	def read_parameters(self, byte_data, current_offset):
 		"""
-			A function to read parameter data for this opcode from the remaining byte data.
+			A function to read parameter data for this opcode from the remaining byte data. The data is read in place.
 			
 			:return: An integer representing the number of bytes ingested from byte_data.
 			:rtype: int
 		"""
-		return 0
+		if self.PARAMETER_STRUCT is None:
+			return 0
+			
+		self.parameters = list(self.PARAMETER_STRUCT.unpack_from(byte_data, current_offset))
+		return self.PARAMETER_STRUCT.size
 				
+	def decode(self, code_block):
+		"""
+			Pre-decodes this opcode for the dispatch loop. Anything that can be worked out ahead of time, such as string
+			table lookups, should be resolved here so that the handler has nothing left to look up.
+			
+			:param code_block: The code block this opcode belongs to.
+			:rtype: tuple
+			:return: A (handler, operand) tuple. The handler is called as handler(vm, operand).
+		"""
+		return (self.handle, None)
+		
+	@staticmethod
+	def handle(vm, operand):
+		"""
+			Performs this opcode with an operand produced by decode.
+			
+			:param vm: The interpreter instance to execute within the context of.
+			:param operand: The operand produced by decode.
+		"""
+		raise NotImplementedError("No handler built.")
+		
+	def execute(self, vm, code_block):
+		"""
+			Decodes and performs this opcode in one go. The dispatch loop uses pre-decoded code instead.
+			
+			:param vm: The interpreter instance to execute within the context of.
+			:param code_block: The code block this opcode belongs to.
+		"""
+		handler, operand = self.decode(code_block)
+		handler(vm, operand)
+		
+	@classmethod
+	def get_batch_struct(cls, count):
+		"""
+			Gets a struct.Struct packing a run of opcodes of this type, each as its identifier followed by its parameters.
+			
+			:param count: The number of opcodes in the run.
+			:rtype: struct.Struct
+			:return: The precompiled layout of the run.
+		"""
+		key = (cls, count)
+		if key not in BATCH_STRUCTS:
+			parameter_format = cls.PARAMETER_STRUCT.format.lstrip("<") if cls.PARAMETER_STRUCT is not None else ""
+			BATCH_STRUCTS[key] = struct.Struct("<" + ("I" + parameter_format) * count)
+		return BATCH_STRUCTS[key]
+		
 	def generate_bytes(self):
 		"""
 			Generates the bytecode necessary for storing this opcode in a format to deserialize from later.
 		"""
-		return struct.pack("<I", self.IDENTIFIER)
\ No newline at end of file
+		return self.get_batch_struct(1).pack(self.IDENTIFIER, *self.parameters)
\ No newline at end of file
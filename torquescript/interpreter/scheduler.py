@@ -0,0 +1,30 @@
+"""
+	Scheduled events are function calls put off until a given simulation time, as made by schedule(). The interpreter
+	keeps them in a heap ordered by when they are due, and looks them up by identifier so they can be cancelled without
+	searching it.
+"""
+
+class ScheduledEvent(object):
+	"""
+		A single scheduled call.
+		
+		identifier: The identifier scripts refer to this event by. Events scheduled later have higher identifiers, so
+		events due at the same time run in the order they were scheduled.
+		time: The simulation time in milliseconds this event is due at.
+		function_name: The name of the function to call.
+		arguments: A list of the values to pass, as described in the value module.
+		sim_object: The sim object whose deletion cancels this event, or None.
+		is_method: Whether or not the function is called as a method of sim_object.
+	"""
+	__slots__ = ["identifier", "time", "function_name", "arguments", "sim_object", "is_method"]
+	
+	def __init__(self, identifier, time, function_name, arguments, sim_object=None, is_method=False):
+		self.identifier = identifier
+		self.time = time
+		self.function_name = function_name
+		self.arguments = arguments
+		self.sim_object = sim_object
+		self.is_method = is_method
+		
+	def __repr__(self):
+		return "<ScheduledEvent %u: %s at %gms>" % (self.identifier, self.function_name, self.time)
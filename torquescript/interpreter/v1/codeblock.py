@@ -1,77 +1,178 @@
 import struct
 
-import tsinterpreter
+import interpreter
 
-class CodeBlock(tsinterpreter.CodeBlock):
+GENERATE_OPCODE_BYTES = getattr(interpreter.OpCode.generate_bytes, "__func__", interpreter.OpCode.generate_bytes)
+"""
+	The default opcode serializer. Opcodes that replace it can't be batched.
+"""
+
+class CodeBlock(interpreter.CodeBlock):
 	STRING_TABLE_TERMINATOR = 0xcab
 	CODE_BLOCK_BEGIN = 0x12345678
 	CODE_BLOCK_END = 0xabcdef
-	VERSION_IDENTIFIER = 0xdeadbeef
+	VERSION_IDENTIFIER = 0xdeadbef1
+	"""
+		Files written before CallFunction carried its argument count used 0xdeadbeef. Their layout differs, so they are
+		rejected as an unknown version rather than misread.
+	"""
+	
+	MAXIMUM_BATCH_SIZE = 4096
+	"""
+		The most opcodes packed by a single struct when serializing.
+	"""
+	
+	string_table_location = None
+	"""
+		A tuple of the start offset, end offset and entry count of the string table in byte_data while it has not been
+		decoded yet.
+	"""
+	
+	decoded_string_table = None
+	"""
+		The decoded string table, or None if it has not been used yet.
+	"""
+	
+	@property
+	def string_table(self):
+		"""
+			The list of strings used by this code block. Loaded code blocks only decode it the first time it is used.
+		"""
+		if self.decoded_string_table is None and self.string_table_location is not None:
+			string_table_start, string_table_end, string_table_entry_count = self.string_table_location
+			
+			# Every entry is NULL terminated, so the last split is always empty
+			string_table_data = self.byte_data[string_table_start:string_table_end].split("\x00")
+			if string_table_data.pop() != "" or len(string_table_data) != string_table_entry_count:
+				raise interpreter.DecoderError("Failed to load string table: Expected %u entries. Found %u." % (string_table_entry_count, len(string_table_data)))
+				
+			self.decoded_string_table = string_table_data
+			self.string_table_location = None
+		return self.decoded_string_table
+		
+	@string_table.setter
+	def string_table(self, value):
+		self.decoded_string_table = value
+		self.string_table_location = None
 	
 	def load(self, byte_data):		
 		string_table_entry_count = self.read_fixed_bytes(int)
 
-		# Load the string table
-		string_table_start = self.byte_data.find(struct.pack("<I", self.STRING_TABLE_TERMINATOR)[0], self.byte_index)
-		if string_table_start == -1:
-			raise tsinterpreter.DecoderError("Failed to load string table: Discovered EOF before terminator.")
-			
-		# FIXME: Technically this allow multiple trailing NULL bytes to be valid
-		string_table_data = self.byte_data[self.byte_index:string_table_start].rstrip("\x00").split("\x00")
-		
-		if len(string_table_data) != string_table_entry_count:
-			raise tsinterpreter.DecoderError("Failed to load string table: Expected %u entries. Found %u." % (string_table_entry_count, len(string_table_data)))
-		self.string_table = string_table_data
+		# Find the string table, leaving the strings themselves to be decoded on first use
+		string_table_end = self.byte_data.find(struct.pack("<I", self.STRING_TABLE_TERMINATOR), self.byte_index)
+		if string_table_end == -1:
+			raise interpreter.DecoderError("Failed to load string table: Discovered EOF before terminator.")
+		self.string_table_location = (self.byte_index, string_table_end, string_table_entry_count)
 		
 		# Read over the string table
-		self.byte_index = string_table_start + 4
+		self.byte_index = string_table_end + 4
 
 		# Begin loading code bytes 
 		self.global_code = []
 		self.function_table = {}
 
-		current_function = None
-		while self.byte_index < len(self.byte_data):
-			current_opcode = self.read_opcode_bytes()
-			current_opcode = current_opcode if current_opcode is not None else self.read_fixed_bytes(int)
+		# The opcode list being filled, either the global code or the current function
+		current_code = self.global_code
+		byte_length = len(self.byte_data)
+		read_opcode_bytes = self.read_opcode_bytes
+		while self.byte_index < byte_length:
+			current_opcode = read_opcode_bytes()
 			
+			# Encountered an opcode
+			if current_opcode is not None:
+				current_code.append(current_opcode)
+				continue
+				
+			current_opcode = self.read_fixed_bytes(int)
 			# Encountered a code block begin
-			if type(current_opcode) is int and current_opcode == self.CODE_BLOCK_BEGIN:
+			if current_opcode == self.CODE_BLOCK_BEGIN:
 				current_function = self.read_variable_bytes().lower()
 				if current_function in self.function_table:
-					raise DecoderError("Encountered function '%s' declared multiple times." % current_function)
-				self.function_table[current_function] = []
+					raise interpreter.DecoderError("Encountered function '%s' declared multiple times." % current_function)
+				current_code = self.function_table[current_function] = []
 			# Encountered a code block end
-			elif type(current_opcode) is int and current_opcode == self.CODE_BLOCK_END:
-				current_function = None
-			# Encountered an opcode with no current function.
-			elif type(current_opcode) in tsinterpreter.tsopcode.OpCode.__subclasses__() and current_function is None:
-				self.global_code.append(current_opcode)
-			# Encountered an opcode with a function.
-			elif type(current_opcode) in tsinterpreter.tsopcode.OpCode.__subclasses__() and current_function is not None:			
-				self.function_table[current_function].append(current_opcode)
+			elif current_opcode == self.CODE_BLOCK_END:
+				current_code = self.global_code
 			else:
-				raise tsinterpreter.DecoderError("Encountered unknown opcode at %s: %s." % (hex(self.byte_index), hex(current_opcode)))
+				raise interpreter.DecoderError("Encountered unknown opcode at %s: %s." % (hex(self.byte_index), hex(current_opcode)))
 				
-	def generate_bytes(self):
-		result = super(CodeBlock, self).generate_bytes()
-		result += struct.pack("<I", len(self.string_table))
+	def write_bytes(self, writer):
+		super(CodeBlock, self).write_bytes(writer)
+		writer.write(struct.pack("<I", len(self.string_table)))
 		
 		# Dump the string table
-		for string_table_entry in self.string_table:
-			result += "%s\x00" % string_table_entry
-		result += struct.pack("<I", self.STRING_TABLE_TERMINATOR)
+		writer.write("".join(["%s\x00" % string_table_entry for string_table_entry in self.string_table]))
+		writer.write(struct.pack("<I", self.STRING_TABLE_TERMINATOR))
 		
 		# Dump global code first
-		for global_code_entry in self.global_code:
-			result += global_code_entry.generate_bytes()
+		self.write_code(writer, self.global_code)
 			
 		# Then functions
 		for function_name, function_code in zip(self.function_table.keys(), self.function_table.values()):
-			result += struct.pack("<I", self.CODE_BLOCK_BEGIN)
-			result += "%s\x00" % function_name
+			writer.write(struct.pack("<I", self.CODE_BLOCK_BEGIN))
+			writer.write("%s\x00" % function_name)
+			self.write_code(writer, function_code)
+			writer.write(struct.pack("<I", self.CODE_BLOCK_END))
+			
+	def write_code(self, writer, code):
+		"""
+			Writes a list of opcodes to a file like object. Opcodes are packed a batch at a time: consecutive opcodes of
+			the same type are grouped into runs, and the whole sequence of runs is packed by one cached struct built from
+			the layout of each run.
+			
+			:param writer: The file like object to write to.
+			:param code: The list of opcodes to write.
+		"""
+		# A dictionary mapping opcode types to whether they write themselves
+		writes_itself = {}
+		for batch_start in range(0, len(code), self.MAXIMUM_BATCH_SIZE):
+			batch_runs = []
+			extend_runs = batch_runs.extend
+			batch_values = []
+			append_value = batch_values.append
+			extend_values = batch_values.extend
+			run_type = None
+			run_start = 0
+			batch = code[batch_start:batch_start + self.MAXIMUM_BATCH_SIZE]
+			for opcode_index, current_opcode in enumerate(batch):
+				opcode_type = type(current_opcode)
+				if opcode_type is not run_type:
+					# Runs are counted once the next one starts
+					if run_type is not None:
+						extend_runs((run_type, opcode_index - run_start))
+					run_type = opcode_type
+					run_start = opcode_index
+					
+					# Opcodes with their own layout have to write themselves
+					opcode_writes_itself = writes_itself.get(opcode_type)
+					if opcode_writes_itself is None:
+						generate_bytes = opcode_type.generate_bytes
+						opcode_writes_itself = writes_itself[opcode_type] = getattr(generate_bytes, "__func__", generate_bytes) is not GENERATE_OPCODE_BYTES
+					if opcode_writes_itself:
+						self.write_runs(writer, batch_runs, batch_values)
+						writer.write(current_opcode.generate_bytes())
+						batch_runs = []
+						extend_runs = batch_runs.extend
+						batch_values = []
+						append_value = batch_values.append
+						extend_values = batch_values.extend
+						run_type = None
+						continue
+						
+				append_value(current_opcode.IDENTIFIER)
+				extend_values(current_opcode.parameters)
+				
+			if run_type is not None:
+				extend_runs((run_type, len(batch) - run_start))
+			self.write_runs(writer, batch_runs, batch_values)
+			
+	def write_runs(self, writer, runs, values):
+		"""
+			Writes runs of opcodes gathered by write_code.
 			
-			for function_code_entry in function_code:
-				result += function_code_entry.generate_bytes()	
-			result += struct.pack("<I", self.CODE_BLOCK_END)
-		return result
\ No newline at end of file
+			:param writer: The file like object to write to.
+			:param runs: A flat list of the type of each run followed by its count.
+			:param values: The identifiers and parameters of every opcode in the runs.
+		"""
+		if len(runs) != 0:
+			writer.write(interpreter.opcode.get_runs_struct(tuple(runs)).pack(*values))
@@ -1,121 +1,270 @@
 import struct
 
-import tsinterpreter
+import interpreter
+from interpreter.classes import SimSet
+from interpreter.value import StringValue, EMPTY_STRING, get_number, get_string, from_python
 
-class PushString(tsinterpreter.tsopcode.OpCode):
+class PushString(interpreter.OpCode):
 	"""
 		An opcode representing a string push operation. The parameter for this opcode is a 2 byte sequence
 		representing the string table entry to push.
 	"""
 	IDENTIFIER = 0x11223344
+	PARAMETER_STRUCT = struct.Struct("<H")
 	
-	def read_parameters(self, byte_data, current_offset):
-		self.parameters = [struct.unpack_from("<H", byte_data, current_offset)[0]]
-		return 2
-				
-	def generate_bytes(self):
-		return struct.pack("<IH", self.IDENTIFIER, self.parameters[0])
+	def decode(self, code_block):
+		# Resolve the string table entry once rather than on every execution, so its numeric form is only parsed once too
+		return (self.handle, StringValue(code_block.string_table[self.parameters[0]]))
 		
-	def execute(self, vm, code_block):
-		vm.stack.append(code_block.string_table[self.parameters[0]])
+	@staticmethod
+	def handle(vm, operand):
+		vm.stack.append(operand)
 		
-class CreateInstance(tsinterpreter.tsopcode.OpCode):
+class CreateInstance(interpreter.OpCode):
 	"""
 		An opcode representing a new object instantiation.
 	"""
 	IDENTIFIER = 0x6660666
 	
-	def execute(self, vm, code_block):
-		object_name = vm.stack.pop()
-		type_name = vm.stack.pop().lower()
+	@staticmethod
+	def handle(vm, operand):
+		object_name = get_string(vm.stack.pop())
+		type_name = vm.get_lowercase(get_string(vm.stack.pop()))
 		
 		if type_name not in vm.object_types:
 			print("Attempted to instantiate non-conobject '%s'" % type_name)
-			vm.stack.append("")
+			vm.stack.append(EMPTY_STRING)
 			return
 		
-		vm.stack.append(vm.object_types[type_name](vm))
+		vm.stack.append(vm.object_types[type_name](vm, object_name))
 		
-class SetMember(tsinterpreter.tsopcode.OpCode):
+class SetMember(interpreter.OpCode):
 	"""
 		An opcode representing a new object instantiation.
 	"""
 	IDENTIFIER = 0x103431
 	
-	def execute(self, vm, code_block):
+	@staticmethod
+	def handle(vm, operand):
 		rhs = vm.stack.pop()
 		lhs = vm.stack.pop()
-		target = vm.stack[-1]
-		target.set_member(lhs, rhs)
+		target = vm.get_object(vm.stack[-1])
 		
-class GetMember(tsinterpreter.tsopcode.OpCode):
+		# A failed instantiation leaves an empty string in place of the object
+		if target is not None:
+			target.set_member(get_string(lhs), rhs)
+		
+class AddObject(interpreter.OpCode):
+	"""
+		An opcode representing the addition of a newly created object to the object it was created inside of. The new
+		object is on top of the stack with its parent beneath it. The new object is removed.
+	"""
+	IDENTIFIER = 0x616464
+	
+	@staticmethod
+	def handle(vm, operand):
+		sim_object = vm.get_object(vm.stack.pop())
+		parent = vm.get_object(vm.stack[-1])
+		
+		# Objects created inside of anything other than a set are left on their own
+		if sim_object is not None and isinstance(parent, SimSet):
+			parent.add_member(sim_object)
+			
+class GetMember(interpreter.OpCode):
 	"""
 		An opcode representing a new object instantiation.
 	"""
 	IDENTIFIER = 0x102085
 	
-	def execute(self, vm, code_block):
+	@staticmethod
+	def handle(vm, operand):
 		rhs = vm.stack.pop()
-		lhs = vm.stack.pop()
-		vm.stack.append(lhs.get_member(rhs))
+		lhs = vm.get_object(vm.stack.pop())
+		if lhs is None:
+			vm.stack.append(EMPTY_STRING)
+			return
+		vm.stack.append(from_python(lhs.get_member(get_string(rhs))))
 		
-class PushImmediate(tsinterpreter.tsopcode.OpCode):
+class PushImmediate(interpreter.OpCode):
 	"""
 		An opcode representing a push of a constant non-string value.
 	"""
 	IDENTIFIER = 0x11443344
+	PARAMETER_STRUCT = struct.Struct("<I")
 	
-	def read_parameters(self, byte_data, current_offset):
-		self.parameters = [struct.unpack_from("<I", byte_data, current_offset)[0]]
-		return 4
-				
-	def generate_bytes(self):
-		return struct.pack("<II", self.IDENTIFIER, self.parameters[0])
-		
-	def execute(self, vm, code_block):
-		vm.stack.append(self.parameters[0])
+	def decode(self, code_block):
+		# Pushing is the same for any value, so this shares the handler the dispatch loop performs inline
+		return (PushString.handle, self.parameters[0])
 		
-class Add(tsinterpreter.tsopcode.OpCode):
+class Add(interpreter.OpCode):
 	"""
 		An opcode representing an addition operation.
 	"""
 	IDENTIFIER = 0x44221100
 	
-	def execute(self, vm, code_block):
+	@staticmethod
+	def handle(vm, operand):
 		rhs = vm.stack.pop()
 		lhs = vm.stack.pop()
 		
+		# Results of arithmetic are always floats, so loops over numbers skip the conversion entirely
+		if type(rhs) is not float:
+			rhs = rhs.number if type(rhs) is StringValue and rhs.number is not None else get_number(rhs)
+		if type(lhs) is not float:
+			lhs = lhs.number if type(lhs) is StringValue and lhs.number is not None else get_number(lhs)
+			
 		# Force floats to better emulate T2 engine behavior
-		vm.stack.append(float(rhs) + float(lhs))
+		vm.stack.append(rhs + lhs)
 		
-class CallFunction(tsinterpreter.tsopcode.OpCode):
+class CallFunction(interpreter.OpCode):
 	"""
-		An opcode representing a push of a constant non-string value.
+		An opcode representing a function call. The function name is on top of the stack with the arguments beneath it.
+		The parameter for this opcode is a 2 byte sequence representing the number of arguments. The arguments are
+		replaced by the return value.
 	"""
 	IDENTIFIER = 0x345671
-						
-	def execute(self, vm, code_block):
+	PARAMETER_STRUCT = struct.Struct("<H")
+	
+	class CallSite(object):
+		"""
+			The inline cache of a single call, remembering what its function name last resolved to.
+			
+			argument_count: The number of arguments passed.
+			function_name: The function name last called, or None.
+			generation: The function generation of the interpreter when the name was resolved.
+			definition: The function definition the name resolved to, or None.
+			builtin: The built in the name resolved to, or None.
+			namespace: The namespace the name was resolved from, for method calls.
+		"""
+		__slots__ = ["argument_count", "function_name", "generation", "definition", "builtin", "namespace"]
+		
+		def __init__(self, argument_count):
+			self.argument_count = argument_count
+			self.function_name = None
+			self.generation = None
+			self.definition = None
+			self.builtin = None
+			self.namespace = None
+	
+	def decode(self, code_block):
+		return (self.handle, CallFunction.CallSite(self.parameters[0]))
+		
+	@staticmethod
+	def handle(vm, operand):
 		function_name = vm.stack.pop()
-		vm.stack = vm.call(function_name)
 		
-class Return(tsinterpreter.tsopcode.OpCode):
+		# Resolve the name again only if it changed or functions were defined since. Names pushed by PushString are the
+		# same value on every execution, so comparing by identity is enough
+		if function_name is not operand.function_name or operand.generation != vm.function_generation:
+			operand.definition, operand.builtin = vm.resolve_function(vm.get_lowercase(get_string(function_name)))
+			operand.function_name = function_name
+			operand.generation = vm.function_generation
+		vm.stack.append(vm.invoke(function_name, operand.definition, operand.builtin, operand.argument_count))
+		
+class CallMethod(interpreter.OpCode):
+	"""
+		An opcode representing a method call. The method name is on top of the stack with the arguments beneath it, the
+		first of which is the object to call the method of. The parameter for this opcode is a 2 byte sequence
+		representing the number of arguments, including the object. The arguments are replaced by the return value.
+	"""
+	IDENTIFIER = 0x6d7468
+	PARAMETER_STRUCT = struct.Struct("<H")
+	
+	def decode(self, code_block):
+		return (self.handle, CallFunction.CallSite(self.parameters[0]))
+		
+	@staticmethod
+	def handle(vm, operand):
+		function_name = vm.stack.pop()
+		target = vm.get_object(vm.stack[len(vm.stack) - operand.argument_count])
+		if target is None:
+			print("Warning: Attempted to call method '%s' of non-existent object" % get_string(function_name))
+			del vm.stack[len(vm.stack) - operand.argument_count:]
+			vm.stack.append(EMPTY_STRING)
+			return
+			
+		# Objects sharing a namespace share the cached resolution, like calls to global functions
+		if function_name is not operand.function_name or target.namespace is not operand.namespace or operand.generation != vm.function_generation:
+			operand.definition, operand.builtin = vm.resolve_method(target.namespace, vm.get_lowercase(get_string(function_name)))
+			operand.function_name = function_name
+			operand.namespace = target.namespace
+			operand.generation = vm.function_generation
+		vm.stack.append(vm.invoke(function_name, operand.definition, operand.builtin, operand.argument_count))
+		
+class Return(interpreter.OpCode):
 	"""
 		An opcode representing a return.
 	"""
 	IDENTIFIER = 0x8675309
 						
-	def execute(self, vm, code_block):
+	@staticmethod
+	def handle(vm, operand):
 		vm.return_from_frame()
 		
-class Subtract(tsinterpreter.tsopcode.OpCode):
+class GetArgument(interpreter.OpCode):
+	"""
+		An opcode representing a read of an argument of the current function. The parameter for this opcode is a 2 byte
+		sequence representing the index of the argument.
+	"""
+	IDENTIFIER = 0x6a7267
+	PARAMETER_STRUCT = struct.Struct("<H")
+	
+	def decode(self, code_block):
+		return (self.handle, self.parameters[0])
+		
+	@staticmethod
+	def handle(vm, operand):
+		vm.stack.append(vm.get_argument(operand))
+		
+class Subtract(interpreter.OpCode):
 	"""
 		An opcode representing a subtraction operation.
 	"""
 	IDENTIFIER = 0x00112233
 	
-	def execute(self, vm, code_block):
+	@staticmethod
+	def handle(vm, operand):
 		rhs = vm.stack.pop()
 		lhs = vm.stack.pop()
 		
+		if type(rhs) is not float:
+			rhs = rhs.number if type(rhs) is StringValue and rhs.number is not None else get_number(rhs)
+		if type(lhs) is not float:
+			lhs = lhs.number if type(lhs) is StringValue and lhs.number is not None else get_number(lhs)
+			
 		# Force floats to better emulate T2 engine behavior
-		vm.stack.append(float(rhs) - float(lhs))
\ No newline at end of file
+		vm.stack.append(rhs - lhs)
+		
+class Pop(interpreter.OpCode):
+	"""
+		An opcode representing the removal of the value on top of the stack.
+	"""
+	IDENTIFIER = 0x706f70
+	
+	@staticmethod
+	def handle(vm, operand):
+		vm.stack.pop()
+		
+class SetGlobal(interpreter.OpCode):
+	"""
+		An opcode representing an assignment to a global variable. The value is on top of the stack with the name of the
+		global beneath it.
+	"""
+	IDENTIFIER = 0x5e761b
+	
+	@staticmethod
+	def handle(vm, operand):
+		value = vm.stack.pop()
+		name = vm.stack.pop()
+		vm.global_variables[vm.get_lowercase(name.string if type(name) is StringValue else get_string(name))] = value
+		
+class GetGlobal(interpreter.OpCode):
+	"""
+		An opcode representing a read of a global variable by the name on top of the stack.
+	"""
+	IDENTIFIER = 0x6e761b
+	
+	@staticmethod
+	def handle(vm, operand):
+		name = vm.stack.pop()
+		vm.stack.append(vm.global_variables.get(vm.get_lowercase(name.string if type(name) is StringValue else get_string(name)), EMPTY_STRING))
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""
+	Main import for version two.
+"""
+
+from codeblock import CodeBlock
@@ -0,0 +1,136 @@
+import io
+import struct
+
+import interpreter
+
+class CodeBlock(interpreter.v1.CodeBlock):
+	"""
+		The version two code block format. It uses the version one opcodes and string table, but the code is preceded by
+		an index mapping each function to the location of its code, so that functions are only decoded when they are
+		first used.
+		
+		The layout is the version identifier, the string table entry count and byte length, the string table, the global
+		code offset and byte length, the function count and then one index entry per function. Each index entry is the
+		NULL terminated function name followed by its code offset and byte length. All offsets are from the start of
+		the file.
+	"""
+	VERSION_IDENTIFIER = 0xdeadbef2
+	
+	LOCATION_STRUCT = struct.Struct("<II")
+	"""
+		The layout of a code location in the index, as an offset and a byte length.
+	"""
+	
+	function_index = None
+	"""
+		A dictionary mapping lowercase function names to the location of their code in byte_data while they have not
+		been decoded yet.
+	"""
+	
+	decoded_function_table = None
+	"""
+		A dictionary mapping lowercase function names to the functions decoded so far.
+	"""
+	
+	@property
+	def function_table(self):
+		"""
+			A dictionary mapping lowercase function names to their opcodes. Using this decodes every function, use
+			get_function to decode only the ones needed.
+		"""
+		for function_name in list(self.function_index.keys()) if self.function_index is not None else []:
+			self.get_function(function_name)
+		return self.decoded_function_table
+		
+	@function_table.setter
+	def function_table(self, value):
+		self.decoded_function_table = value
+		self.function_index = None
+		
+	def get_function_names(self):
+		result = list(self.decoded_function_table.keys())
+		if self.function_index is not None:
+			result += self.function_index.keys()
+		return result
+		
+	def get_function(self, function_name):
+		if self.function_index is not None and function_name in self.function_index:
+			self.decoded_function_table[function_name] = self.read_code(*self.function_index.pop(function_name))
+		return self.decoded_function_table[function_name]
+		
+	def read_code(self, code_offset, code_length):
+		"""
+			Decodes the opcodes in a range of byte_data.
+			
+			:param code_offset: The offset of the first opcode.
+			:param code_length: The length of the code in bytes.
+			:rtype: list
+			:return: A list of opcodes.
+		"""
+		result = []
+		code_end = code_offset + code_length
+		if code_end > len(self.byte_data):
+			raise interpreter.DecoderError("Code at %s runs past the end of the file." % hex(code_offset))
+			
+		self.byte_index = code_offset
+		while self.byte_index < code_end:
+			current_opcode = self.read_opcode_bytes()
+			if current_opcode is None:
+				raise interpreter.DecoderError("Encountered unknown opcode at %s: %s." % (hex(self.byte_index), hex(self.read_fixed_bytes(int, advance=False))))
+			result.append(current_opcode)
+		return result
+		
+	def load(self, byte_data):
+		string_table_entry_count = self.read_fixed_bytes(int)
+		string_table_length = self.read_fixed_bytes(int)
+		
+		# Leave the strings themselves to be decoded on first use
+		self.string_table_location = (self.byte_index, self.byte_index + string_table_length, string_table_entry_count)
+		self.byte_index += string_table_length
+		
+		global_code_location = self.LOCATION_STRUCT.unpack_from(self.byte_data, self.byte_index)
+		self.byte_index += self.LOCATION_STRUCT.size
+		
+		# Read the index, functions are decoded as they are asked for
+		self.decoded_function_table = {}
+		self.function_index = {}
+		function_count = self.read_fixed_bytes(int)
+		for function_index in range(function_count):
+			function_name = self.read_variable_bytes().lower()
+			if function_name in self.function_index:
+				raise interpreter.DecoderError("Encountered function '%s' declared multiple times." % function_name)
+				
+			self.function_index[function_name] = self.LOCATION_STRUCT.unpack_from(self.byte_data, self.byte_index)
+			self.byte_index += self.LOCATION_STRUCT.size
+			
+		# Global code runs as soon as the block is registered, so there is no point in deferring it
+		self.global_code = self.read_code(*global_code_location)
+		
+	def write_bytes(self, writer):
+		string_table_data = "".join(["%s\x00" % string_table_entry for string_table_entry in self.string_table])
+		
+		# Lay out the code first so that the index can point at it
+		code_writer = io.BytesIO()
+		self.write_code(code_writer, self.global_code)
+		global_code_length = code_writer.tell()
+		
+		function_locations = []
+		for function_name, function_code in self.function_table.items():
+			code_start = code_writer.tell()
+			self.write_code(code_writer, function_code)
+			function_locations.append((function_name, code_start, code_writer.tell() - code_start))
+			
+		# The code follows the header, the string table and the index
+		code_offset = 4 * 3 + len(string_table_data) + self.LOCATION_STRUCT.size + 4
+		code_offset += sum([len(function_name) + 1 + self.LOCATION_STRUCT.size for function_name, code_start, code_length in function_locations])
+		
+		interpreter.CodeBlock.write_bytes(self, writer)
+		writer.write(struct.pack("<II", len(self.string_table), len(string_table_data)))
+		writer.write(string_table_data)
+		writer.write(self.LOCATION_STRUCT.pack(code_offset, global_code_length))
+		
+		writer.write(struct.pack("<I", len(function_locations)))
+		for function_name, code_start, code_length in function_locations:
+			writer.write("%s\x00" % function_name)
+			writer.write(self.LOCATION_STRUCT.pack(code_offset + code_start, code_length))
+		writer.write(code_writer.getvalue())
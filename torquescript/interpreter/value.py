@@ -0,0 +1,149 @@
+"""
+	The values scripts operate on. Everything in Torque Script is a string, but values keep the type they were made
+	with and only work out their other forms when asked, so numeric code doesn't turn numbers into strings and back on
+	every operation. The python type of a value is its tag:
+	
+	int: An integer, such as a PushImmediate constant.
+	float: A number produced by arithmetic.
+	StringValue: A string, remembering its numeric form once it has been read as a number.
+	NativeValue: A python object a built in returned, such as a Vector3, formatted as a string only when needed.
+	SimObject: An object, which reads as its identifier.
+"""
+
+import re
+
+NUMBER_PATTERN = re.compile("\\s*[-+]?(?:[0-9]+\\.?[0-9]*|\\.[0-9]+)(?:[eE][-+]?[0-9]+)?")
+"""
+	The pattern matching the leading number of a string, as read by atof in the engine.
+"""
+
+def parse_number(string):
+	"""
+		Reads the number at the start of a string the way the engine does. Anything that doesn't start with a number
+		reads as zero.
+		
+		:param string: The string to read.
+		:rtype: float
+		:return: The number read.
+	"""
+	try:
+		return float(string)
+	except ValueError:
+		match_data = NUMBER_PATTERN.match(string)
+		if match_data is None:
+			return 0.0
+		return float(match_data.group(0))
+		
+class StringValue(object):
+	"""
+		A string value. String values are never modified once made, other than filling in their numeric form, so they
+		can be shared freely between the stack, variables and decoded code.
+		
+		string: The string.
+		number: The numeric form, or None if it has not been needed yet.
+	"""
+	__slots__ = ["string", "number"]
+	
+	def __init__(self, string):
+		self.string = string
+		self.number = None
+		
+	def get_string(self):
+		return self.string
+		
+	def get_number(self):
+		if self.number is None:
+			self.number = parse_number(self.get_string())
+		return self.number
+		
+	def __str__(self):
+		return self.get_string()
+		
+	def __float__(self):
+		return self.get_number()
+		
+	def __int__(self):
+		return int(self.get_number())
+		
+	def __repr__(self):
+		return "<%s: %s>" % (self.__class__.__name__, repr(self.get_string()))
+		
+class NativeValue(StringValue):
+	"""
+		A string value made from a python object, such as a Vector3 returned by a built in. Built ins that understand
+		the object take it as it is, anything else sees its string form.
+		
+		native: The python object.
+	"""
+	__slots__ = ["native"]
+	
+	def __init__(self, native):
+		self.string = None
+		self.number = None
+		self.native = native
+		
+	def get_string(self):
+		if self.string is None:
+			self.string = str(self.native)
+		return self.string
+		
+EMPTY_STRING = StringValue("")
+"""
+	The empty string, read from anything that was never assigned.
+"""
+
+def get_number(value):
+	"""
+		Gets the numeric form of a value.
+		
+		:param value: The value to read.
+		:rtype: float
+		:return: The numeric form.
+	"""
+	value_type = type(value)
+	if value_type is float:
+		return value
+	elif value_type is StringValue or value_type is NativeValue:
+		return value.get_number()
+	elif value_type is int:
+		return float(value)
+	elif hasattr(value, "identifier"):
+		return float(value.identifier)
+	return parse_number(str(value))
+	
+def get_string(value):
+	"""
+		Gets the string form of a value, as scripts see it.
+		
+		:param value: The value to read.
+		:rtype: str
+		:return: The string form.
+	"""
+	value_type = type(value)
+	if value_type is StringValue:
+		return value.string
+	elif value_type is NativeValue:
+		return value.get_string()
+	elif hasattr(value, "identifier"):
+		return str(value.identifier)
+	return str(value)
+	
+def from_python(value):
+	"""
+		Makes a value from a python object.
+		
+		:param value: A string, number, sim object or other python object. Other objects, such as a Vector3, read as
+		their string form but are kept for built ins that understand them.
+		:rtype: object
+		:return: The value.
+	"""
+	value_type = type(value)
+	if value_type is StringValue or value_type is float or value_type is int:
+		return value
+	elif value_type is str:
+		return StringValue(value)
+	elif value_type is long or value_type is bool:
+		return int(value)
+	elif hasattr(value, "identifier"):
+		return value
+	return NativeValue(value)
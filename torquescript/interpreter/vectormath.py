@@ -0,0 +1,257 @@
+"""
+	Vector math built ins. Scripts pass vectors around as "x y z" strings, so parsed vectors are cached by their string
+	and results are handed back as Vector3 values that only format themselves when used as a string.
+	
+	A batch API applying one operation to many vectors at once is provided when NumPy is available.
+"""
+
+import math
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from builtins import builtin
+from value import StringValue, NativeValue, get_string
+
+class Vector3(object):
+	"""
+		A three component vector as handled by the vector built ins. Vector3 values are immutable, so parsed vectors
+		can be shared through the parse cache.
+	"""
+	__slots__ = ["x", "y", "z", "string"]
+	
+	PARSE_CACHE_SIZE = 4096
+	"""
+		The number of parsed vector strings to remember before the cache is emptied.
+	"""
+	
+	parse_cache = {}
+	"""
+		A dictionary mapping vector strings to their parsed Vector3.
+	"""
+	
+	def __init__(self, x, y, z, string=None):
+		self.x = x
+		self.y = y
+		self.z = z
+		self.string = string
+		
+	@classmethod
+	def from_value(cls, value):
+		"""
+			Converts a script value to a vector. Missing or malformed components read as zero, as they do in the
+			engine.
+			
+			:param value: A Vector3, script value or string.
+			:rtype: Vector3
+			:return: The vector.
+		"""
+		value_type = type(value)
+		if value_type is StringValue:
+			value = value.string
+		elif value_type is NativeValue and type(value.native) is cls:
+			# Vectors handed back by other vector built ins are used as they are
+			return value.native
+		elif value_type is cls:
+			return value
+		elif value_type is not str:
+			value = get_string(value)
+			
+		result = cls.parse_cache.get(value)
+		if result is None:
+			components = []
+			for component in value.split()[:3]:
+				try:
+					components.append(float(component))
+				except ValueError:
+					components.append(0.0)
+			components += [0.0] * (3 - len(components))
+			
+			if len(cls.parse_cache) >= cls.PARSE_CACHE_SIZE:
+				cls.parse_cache.clear()
+			result = cls.parse_cache[value] = cls(components[0], components[1], components[2], value)
+		return result
+		
+	def __str__(self):
+		if self.string is None:
+			self.string = "%f %f %f" % (self.x, self.y, self.z)
+		return self.string
+		
+	def __repr__(self):
+		return "<Vector3: %s>" % str(self)
+		
+	def __float__(self):
+		# Like atof in the engine, a vector reads as its first component when used as a number
+		return self.x
+		
+	def __eq__(self, other):
+		return type(other) is Vector3 and (self.x, self.y, self.z) == (other.x, other.y, other.z)
+		
+	def __ne__(self, other):
+		return not self == other
+		
+	def __hash__(self):
+		return hash((self.x, self.y, self.z))
+		
+	def length(self):
+		return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+		
+@builtin((Vector3, Vector3), Vector3, pure=True)
+def vectorAdd(vm, lhs, rhs):
+	"""
+		Adds two vectors together.
+	"""
+	return Vector3(lhs.x + rhs.x, lhs.y + rhs.y, lhs.z + rhs.z)
+	
+@builtin((Vector3, Vector3), Vector3, pure=True)
+def vectorSub(vm, lhs, rhs):
+	"""
+		Subtracts the second vector from the first.
+	"""
+	return Vector3(lhs.x - rhs.x, lhs.y - rhs.y, lhs.z - rhs.z)
+	
+@builtin((Vector3, float), Vector3, pure=True)
+def vectorScale(vm, vector, scale):
+	"""
+		Multiplies a vector by a scalar.
+	"""
+	return Vector3(vector.x * scale, vector.y * scale, vector.z * scale)
+	
+@builtin((Vector3, Vector3), float, pure=True)
+def vectorDot(vm, lhs, rhs):
+	"""
+		Calculates the dot product of two vectors.
+	"""
+	return lhs.x * rhs.x + lhs.y * rhs.y + lhs.z * rhs.z
+	
+@builtin((Vector3, Vector3), Vector3, pure=True)
+def vectorCross(vm, lhs, rhs):
+	"""
+		Calculates the cross product of two vectors.
+	"""
+	return Vector3(lhs.y * rhs.z - lhs.z * rhs.y, lhs.z * rhs.x - lhs.x * rhs.z, lhs.x * rhs.y - lhs.y * rhs.x)
+	
+@builtin((Vector3,), float, pure=True)
+def vectorLen(vm, vector):
+	"""
+		Calculates the length of a vector.
+	"""
+	return vector.length()
+	
+@builtin((Vector3,), Vector3, pure=True)
+def vectorNormalize(vm, vector):
+	"""
+		Scales a vector to unit length. A zero vector stays zero.
+	"""
+	length = vector.length()
+	if length == 0:
+		return Vector3(0.0, 0.0, 0.0)
+	return Vector3(vector.x / length, vector.y / length, vector.z / length)
+	
+@builtin((Vector3, Vector3), float, pure=True)
+def vectorDist(vm, lhs, rhs):
+	"""
+		Calculates the distance between two points.
+	"""
+	return Vector3(lhs.x - rhs.x, lhs.y - rhs.y, lhs.z - rhs.z).length()
+	
+def get_batch_lengths(vectors):
+	"""
+		Calculates the length of every vector in an array.
+		
+		:param vectors: An array of shape (count, 3).
+		:rtype: numpy.ndarray
+		:return: An array of shape (count,).
+	"""
+	return numpy.sqrt((vectors * vectors).sum(axis=1))
+	
+def normalize_batch(vectors):
+	"""
+		Scales every vector in an array to unit length. Like vectorNormalize, zero vectors stay zero.
+		
+		:param vectors: An array of shape (count, 3).
+		:rtype: numpy.ndarray
+		:return: A new array of shape (count, 3).
+	"""
+	lengths = get_batch_lengths(vectors)
+	
+	# Leave zero vectors at zero rather than dividing by zero
+	lengths[lengths == 0] = 1.0
+	return vectors / lengths[:, numpy.newaxis]
+	
+def scale_batch(vectors, scales):
+	"""
+		Multiplies every vector in an array by a scalar.
+		
+		:param vectors: An array of shape (count, 3).
+		:param scales: A single scale for every vector, or a sequence with one scale per vector.
+		:rtype: numpy.ndarray
+		:return: A new array of shape (count, 3).
+	"""
+	scales = numpy.asarray(scales, dtype=float)
+	if scales.ndim == 1:
+		scales = scales[:, numpy.newaxis]
+	return vectors * scales
+	
+BATCH_OPERATIONS = {
+	"vectoradd": (lambda lhs, rhs: lhs + rhs, 2),
+	"vectorsub": (lambda lhs, rhs: lhs - rhs, 2),
+	"vectorscale": (scale_batch, 1),
+	"vectordot": (lambda lhs, rhs: (lhs * rhs).sum(axis=1), 2),
+	"vectorcross": (lambda lhs, rhs: numpy.cross(lhs, rhs), 2),
+	"vectorlen": (get_batch_lengths, 1),
+	"vectornormalize": (normalize_batch, 1),
+	"vectordist": (lambda lhs, rhs: get_batch_lengths(lhs - rhs), 2),
+}
+"""
+	A dictionary mapping lowercase vector built in names to a NumPy implementation taking arrays of vectors, and the
+	number of leading arguments that are vectors. Any further arguments are passed through as they are.
+"""
+
+def to_array(vectors):
+	"""
+		Converts a sequence of vectors to a NumPy array of shape (count, 3).
+		
+		:param vectors: A sequence of vector strings or Vector3 values, or an existing array.
+		:rtype: numpy.ndarray
+		:return: The array of vectors.
+	"""
+	if numpy is None:
+		raise ImportError("The batch vector API requires NumPy.")
+	elif isinstance(vectors, numpy.ndarray):
+		return vectors.astype(float).reshape(-1, 3)
+		
+	result = numpy.empty((len(vectors), 3))
+	for vector_index, vector in enumerate(vectors):
+		vector = Vector3.from_value(vector)
+		result[vector_index] = (vector.x, vector.y, vector.z)
+	return result
+	
+def format_array(vectors):
+	"""
+		Converts a NumPy array of vectors back to the vector strings scripts use.
+		
+		:param vectors: An array of shape (count, 3).
+		:rtype: list
+		:return: A list of vector strings.
+	"""
+	return ["%f %f %f" % tuple(vector) for vector in vectors]
+	
+def batch(function_name, *arguments):
+	"""
+		Applies a vector built in to many vectors at once.
+		
+		:param function_name: The name of the vector built in, such as "vectorAdd".
+		:param arguments: The arguments of the built in, each given as a sequence with one entry per call or as an array.
+		vectorScale also accepts a single scale for every vector.
+		:rtype: numpy.ndarray
+		:return: An array of shape (count, 3) for built ins returning vectors, or (count,) for built ins returning numbers.
+	"""
+	if numpy is None:
+		raise ImportError("The batch vector API requires NumPy.")
+		
+	operation, vector_count = BATCH_OPERATIONS[function_name.lower()]
+	vector_arguments = [to_array(argument) for argument in arguments[:vector_count]]
+	return operation(*(vector_arguments + list(arguments[vector_count:])))
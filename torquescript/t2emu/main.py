@@ -2,6 +2,9 @@
 	Main script for emulating a Tribes 2 console of sorts.
 """
 
+import time
+
+import interpreter
 import classes
 import builtins
 
@@ -15,6 +18,20 @@ class TorqueScriptCompleter(object):
 		self.options = options
 
 class Application(object):
+	virtual_machine = None
+	"""
+		The interpreter instance scripts run in.
+	"""
+	
+	time_step = None
+	"""
+		The simulation time in milliseconds to advance by for each line of input, or None to follow real time.
+	"""
+	
+	def __init__(self, time_step=None):
+		self.virtual_machine = interpreter.Interpreter()
+		self.time_step = time_step
+		
 	def main(self):
 		# Attempt to initialize GNU readline for some sweet autocomplete action.
 		try:
@@ -26,8 +43,15 @@ class Application(object):
 		print(" ")
 		
 		
+		start_time = time.time()
 		while True:
 			raw_input("> ")
+			
+			# Run the scheduled events that came due while waiting on input
+			if self.time_step is None:
+				self.virtual_machine.process_until((time.time() - start_time) * 1000)
+			else:
+				self.virtual_machine.process_until(self.virtual_machine.current_time + self.time_step)
 		
 if __name__ == "__main__":
 	Application().main()
\ No newline at end of file